@@ -1,10 +1,10 @@
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from numbers import Number
 
-
-with open("Day 1 - Sonar Sweep/input.txt", 'r') as f:
-    depths = []
-    for line in f:
-        depths.append(int(line))
+import numpy as np
 
 
 #######################################################
@@ -32,9 +32,6 @@ def calculate_increases(arr: list[Number]):
     return n_larger
 
 
-print(f"Number of measurements larger than the previous measurement: {calculate_increases(depths)}")
-
-
 #######################################################
 # Part 2
 
@@ -56,6 +53,236 @@ def create_sliding_windows(arr: list[Number], size_window: int):
     return arr_windowed
 
 
-depths_windows = create_sliding_windows(depths, 3)
-print(f"Number of measurements larger than the previous measurement in windowed array: "
-      f"{calculate_increases(depths_windows)}")
+#######################################################
+# Streaming
+
+def parse_depths(source: Iterable[str | Number]) -> Iterator[Number]:
+    """Lazily parses depths from any iterable, e.g. an open file handle or a list of numbers.
+
+    Args:
+        source: Iterable of numbers or of lines containing one number each.
+
+    Yields:
+        Depths, one at a time.
+
+    """
+    for value in source:
+        if isinstance(value, (str, bytes)):
+            if not value.strip():
+                continue
+            value = int(value)
+        yield value
+
+
+def stream_increases(source: Iterable[str | Number], size_window: int = 1) -> Iterator[int]:
+    """Yields the running number of increases between consecutive sliding windows.
+
+    Two consecutive windows share all but one element, so the sum of the new window is larger than the sum of the
+    previous one only if the incoming element is larger than the outgoing one. Only the last `size_window` elements
+    are kept in memory and the sums of the windows are never calculated.
+
+    Args:
+        source: Iterable of numbers or of lines containing one number each.
+        size_window: Size of the window.
+
+    Yields:
+        Number of increases so far, once per compared window.
+
+    """
+    if size_window < 1:
+        raise ValueError(f"The size of the window must be at least 1, got {size_window}")
+
+    window = deque(maxlen=size_window)
+    n_larger = 0
+    for depth in parse_depths(source):
+        if len(window) == size_window:
+            if depth > window[0]:
+                n_larger += 1
+            yield n_larger
+
+        # The outgoing element is dropped automatically when the buffer is full
+        window.append(depth)
+
+
+def count_increases_streaming(source: Iterable[str | Number], size_window: int = 1) -> int:
+    """Calculates the number of increases between consecutive sliding windows of a stream of numbers.
+
+    Args:
+        source: Iterable of numbers or of lines containing one number each.
+        size_window: Size of the window.
+
+    Returns:
+        Number of increases.
+
+    """
+    n_larger = 0
+    for n_larger in stream_increases(source, size_window):
+        pass
+
+    return n_larger
+
+
+#######################################################
+# Vectorized
+
+def load_depths_array(path: str, binary: bool = False, dtype: np.dtype = np.int64) -> np.ndarray:
+    """Loads all the depths of a file into a numpy array at once.
+
+    Args:
+        path: Path to the file with the depths.
+        binary: If True, the file is a raw array of `dtype` values and it's memory-mapped instead of parsed.
+        dtype: Type of the depths.
+
+    Returns:
+        Array of depths.
+
+    """
+    if binary:
+        return np.memmap(path, dtype=dtype, mode='r')
+
+    return np.fromfile(path, dtype=dtype, sep=' ')
+
+
+def calculate_increases_multi_window(depths: np.ndarray, sizes_window: Iterable[int]) -> dict[int, int]:
+    """Calculates the number of increases between consecutive sliding windows for several window sizes.
+
+    The sum of a window is larger than the sum of the previous one only if its last element is larger than the first
+    element of the previous window, so each size is just a comparison of the array with a shifted view of itself.
+
+    Args:
+        depths: Array of depths.
+        sizes_window: Sizes of the windows.
+
+    Returns:
+        Number of increases for each window size.
+
+    """
+    increases = {}
+    for size_window in sizes_window:
+        if size_window < 1:
+            raise ValueError(f"The size of the window must be at least 1, got {size_window}")
+        increases[size_window] = int(np.count_nonzero(depths[size_window:] > depths[:-size_window]))
+
+    return increases
+
+
+#######################################################
+# Parallel
+
+def find_chunk_bounds(path: str, n_chunks: int) -> list[tuple[int, int]]:
+    """Splits a file into byte ranges that start and end at line boundaries.
+
+    Args:
+        path: Path to the file with the depths.
+        n_chunks: Maximum number of chunks.
+
+    Returns:
+        List of (start, end) byte offsets.
+
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, n_chunks):
+            # Move the boundary to the start of the next line
+            f.seek(max(size * i // n_chunks - 1, bounds[-1]))
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def count_increases_chunk(path: str, start: int, end: int, size_window: int) -> int:
+    """Calculates the number of window increases whose outgoing element lies inside a byte range of a file.
+
+    The `size_window` elements after the end of the chunk are read too, so that the comparisons straddling the
+    boundary with the next chunks are counted exactly once.
+
+    Args:
+        path: Path to the file with the depths.
+        start: Start byte offset of the chunk, at a line boundary.
+        end: End byte offset of the chunk, at a line boundary.
+        size_window: Size of the window.
+
+    Returns:
+        Number of increases.
+
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        # Parse the bytes directly, without decoding a copy of the chunk
+        chunk = np.fromstring(f.read(end - start), dtype=np.int64, sep=' ')
+
+        ahead = []
+        while len(ahead) < size_window:
+            line = f.readline()
+            if not line:
+                break
+            if line.strip():
+                ahead.append(int(line))
+
+    depths = np.concatenate([chunk, np.array(ahead, dtype=np.int64)])
+    n_compared = min(len(chunk), len(depths) - size_window)
+    if n_compared <= 0:
+        return 0
+
+    return int(np.count_nonzero(depths[size_window:size_window + n_compared] > depths[:n_compared]))
+
+
+def count_increases_parallel(path: str, size_window: int = 1, n_workers: int | None = None,
+                             chunk_size: int = 1 << 26) -> int:
+    """Calculates the number of increases between consecutive sliding windows of a file using a pool of processes.
+
+    The file is split into chunks of about `chunk_size` bytes, usually many more than workers, so the memory of each
+    worker doesn't grow with the size of the file.
+
+    Args:
+        path: Path to the file with the depths.
+        size_window: Size of the window.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+        chunk_size: Approximate size in bytes of each chunk.
+
+    Returns:
+        Number of increases.
+
+    """
+    if size_window < 1:
+        raise ValueError(f"The size of the window must be at least 1, got {size_window}")
+
+    n_workers = n_workers or os.cpu_count() or 1
+    n_chunks = max(n_workers, -(-os.path.getsize(path) // chunk_size))
+    bounds = find_chunk_bounds(path, n_chunks)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        counts = executor.map(count_increases_chunk, *zip(*[(path, start, end, size_window) for start, end in bounds]))
+
+    return sum(counts)
+
+
+if __name__ == "__main__":
+    with open("Day 1 - Sonar Sweep/input.txt", 'r') as f:
+        depths = []
+        for line in f:
+            depths.append(int(line))
+
+    # Part 1
+    print(f"Number of measurements larger than the previous measurement: {calculate_increases(depths)}")
+
+    # Part 2
+    depths_windows = create_sliding_windows(depths, 3)
+    print(f"Number of measurements larger than the previous measurement in windowed array: "
+          f"{calculate_increases(depths_windows)}")
+
+    # Streaming
+    with open("Day 1 - Sonar Sweep/input.txt", 'r') as f:
+        print(f"Number of measurements larger than the previous measurement in windowed array (streaming): "
+              f"{count_increases_streaming(f, 3)}")
+
+    # Vectorized
+    increases_windows = calculate_increases_multi_window(load_depths_array("Day 1 - Sonar Sweep/input.txt"), [1, 3])
+    print(f"Number of measurements larger than the previous measurement for window sizes 1 and 3 (vectorized): "
+          f"{increases_windows[1]} and {increases_windows[3]}")
+
+    # Parallel
+    print(f"Number of measurements larger than the previous measurement in windowed array (parallel): "
+          f"{count_increases_parallel('Day 1 - Sonar Sweep/input.txt', 3)}")
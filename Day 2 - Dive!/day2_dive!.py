@@ -1,3 +1,21 @@
+import numpy as np
+
+
+OPCODES = {'forward': 0, 'down': 1, 'up': 2}
+
+# Opcode of each possible first byte of a command, -1 for unknown directions
+OPCODES_BY_BYTE = np.full(256, -1, dtype=np.int8)
+for direction, opcode in OPCODES.items():
+    OPCODES_BY_BYTE[ord(direction[0])] = opcode
+
+# Bytes that separate the direction from the amount or fill empty lines, besides the new line
+BLANK_BYTES = np.zeros(256, dtype=bool)
+BLANK_BYTES[list(b' \t\r\v\f')] = True
+
+# Number of commands replayed at once when building checkpoints
+REPLAY_BLOCK_SIZE = 1 << 20
+
+
 def read_input() -> list[tuple[str, int]]:
     """Reads input data."""
     with open("Day 2 - Dive!/input.txt", 'r') as f:
@@ -59,6 +77,289 @@ def calculate_position_new_instructions(commands: list[tuple[str, int]]) -> tupl
     return hor, ver
 
 
+def parse_commands_bytes(data: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """Parses complete lines of commands into arrays of opcodes and amounts, without creating a string per command.
+
+    Each line must start with a whole direction followed by a blank, and lines with only blanks are skipped. The amount
+    comes from the digits of the line, each one weighted by the power of ten of the digits that follow it, so it must
+    have at most 18 digits to fit in int64.
+
+    Args:
+        data: Lines of commands, ending with a new line.
+
+    Returns:
+        Arrays of opcodes and amounts.
+
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    is_newline = buf == ord('\n')
+    line_ends = np.flatnonzero(is_newline)
+
+    # Number of the line of each byte
+    line_idxs = np.cumsum(is_newline, dtype=np.int64) - is_newline
+
+    # The first byte that is not blank starts the direction of its line
+    content = np.flatnonzero(~BLANK_BYTES[buf] & ~is_newline)
+    content_lines = line_idxs[content]
+    is_first = np.diff(content_lines, prepend=-1) != 0
+    starts = content[is_first]
+    lines = content_lines[is_first]
+
+    # Check the whole direction and the blank after it, not only the first byte
+    opcodes = OPCODES_BY_BYTE[buf[starts]]
+    for direction, opcode in OPCODES.items():
+        selected = np.flatnonzero(opcodes == opcode)
+        word = np.frombuffer(direction.encode(), dtype=np.uint8)
+        idxs = np.minimum(starts[selected, None] + np.arange(len(word) + 1), len(buf) - 1)
+        matches = (buf[idxs[:, :-1]] == word).all(axis=1) & BLANK_BYTES[buf[idxs[:, -1]]]
+        opcodes[selected[~matches]] = -1
+    if (opcodes == -1).any():
+        bad = np.flatnonzero(opcodes == -1)[0]
+        command = data[starts[bad]:line_ends[lines[bad]]].decode(errors='replace')
+        raise ValueError(f"Unknown direction in command {command!r}")
+
+    digit_pos = np.flatnonzero((buf >= ord('0')) & (buf <= ord('9')))
+    digit_lines = line_idxs[digit_pos]
+    n_digits = np.bincount(digit_lines, minlength=len(line_ends))
+    invalid = (n_digits[lines] == 0) | (n_digits[lines] > 18)
+    if invalid.any():
+        bad = np.flatnonzero(invalid)[0]
+        command = data[starts[bad]:line_ends[lines[bad]]].decode(errors='replace')
+        raise ValueError(f"Invalid amount in command {command!r}")
+
+    # Digits after each digit in its line
+    first_digits = np.cumsum(n_digits) - n_digits
+    powers = n_digits[digit_lines] - (np.arange(len(digit_pos)) - first_digits[digit_lines]) - 1
+    values = (buf[digit_pos] - ord('0')).astype(np.int64) * np.power(10, powers, dtype=np.int64)
+
+    # Digits of a line are contiguous, so each line is a segment of the values
+    amounts = np.zeros(len(line_ends), dtype=np.int64)
+    segments = np.flatnonzero(np.diff(digit_lines, prepend=-1))
+    if len(segments):
+        amounts[digit_lines[segments]] = np.add.reduceat(values, segments)
+
+    return opcodes, amounts[lines]
+
+
+def read_input_encoded(path: str = "Day 2 - Dive!/input.txt",
+                       chunk_size: int = 1 << 22) -> tuple[np.ndarray, np.ndarray]:
+    """Reads input data as arrays of opcodes and amounts, in chunks of bytes that are cut at the last new line."""
+    opcodes = []
+    amounts = []
+    rest = b''
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            chunk = rest + chunk
+            cut = chunk.rfind(b'\n') + 1
+            rest = chunk[cut:]
+            if cut:
+                chunk_opcodes, chunk_amounts = parse_commands_bytes(chunk[:cut])
+                opcodes.append(chunk_opcodes)
+                amounts.append(chunk_amounts)
+
+    if rest.strip():
+        chunk_opcodes, chunk_amounts = parse_commands_bytes(rest + b'\n')
+        opcodes.append(chunk_opcodes)
+        amounts.append(chunk_amounts)
+
+    return (np.concatenate(opcodes + [np.empty(0, dtype=np.int8)]),
+            np.concatenate(amounts + [np.empty(0, dtype=np.int64)]))
+
+
+def split_amounts(opcodes: np.ndarray, amounts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Splits the amounts into forward moves and signed vertical moves.
+
+    Args:
+        opcodes: Array of opcodes.
+        amounts: Array of amounts.
+
+    Returns:
+        Forward amounts and signed up/down amounts.
+
+    """
+    forward = np.where(opcodes == OPCODES['forward'], amounts, 0)
+    vertical = np.where(opcodes == OPCODES['down'], amounts, 0) - np.where(opcodes == OPCODES['up'], amounts, 0)
+
+    return forward, vertical
+
+
+def calculate_position_vectorized(opcodes: np.ndarray, amounts: np.ndarray) -> tuple:
+    """Calculates the final horizontal and vertical position of the submarine from encoded commands.
+
+    Args:
+        opcodes: Array of opcodes.
+        amounts: Array of amounts.
+
+    Returns:
+        Horizontal and vertical position.
+
+    """
+    forward, vertical = split_amounts(opcodes, amounts)
+
+    return int(forward.sum()), int(vertical.sum())
+
+
+def calculate_position_new_instructions_vectorized(opcodes: np.ndarray, amounts: np.ndarray) -> tuple:
+    """Calculates the final horizontal and vertical position of the submarine using the new instructions from encoded
+    commands.
+
+    The aim is the cumulative sum of the vertical moves and the depth is the dot product of the aim and the forward
+    moves.
+
+    Args:
+        opcodes: Array of opcodes.
+        amounts: Array of amounts.
+
+    Returns:
+        Horizontal and vertical position.
+
+    """
+    forward, vertical = split_amounts(opcodes, amounts)
+    aim = np.cumsum(vertical)
+
+    return int(forward.sum()), int(np.dot(aim, forward))
+
+
+class PositionIndex:
+
+    def __init__(self, opcodes: np.ndarray, amounts: np.ndarray, checkpoint_every: int = 1):
+        """Index of the (horizontal, depth, aim) states of the submarine after every command, using the new
+        instructions.
+
+        Only the state every `checkpoint_every` commands is stored. Queries replay at most `checkpoint_every` commands
+        from the closest checkpoint, so with the default of 1 they are O(1).
+
+        Args:
+            opcodes: Array of opcodes.
+            amounts: Array of amounts.
+            checkpoint_every: Number of commands between stored states.
+
+        """
+        if checkpoint_every < 1:
+            raise ValueError(f"The checkpoint interval must be at least 1, got {checkpoint_every}")
+
+        self.checkpoint_every = checkpoint_every
+        self.opcodes = np.empty(0, dtype=np.int8)
+        self.amounts = np.empty(0, dtype=np.int64)
+        self.checkpoints = np.zeros((1, 3), dtype=np.int64)
+        self.n_commands = 0
+        self.extend(opcodes, amounts)
+
+    def __len__(self):
+        return self.n_commands
+
+    def __repr__(self):
+        return f"PositionIndex(n_commands={self.n_commands}, checkpoint_every={self.checkpoint_every})"
+
+    def replay(self, start_state: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Calculates the states after each of the commands in [start, stop) starting from a given state.
+
+        Args:
+            start_state: State before the command `start`.
+            start: Index of the first command.
+            stop: Index after the last command.
+
+        Returns:
+            Array of shape (stop - start, 3) with the states.
+
+        """
+        forward, vertical = split_amounts(self.opcodes[start:stop], self.amounts[start:stop])
+        hor, depth, aim = start_state
+        aims = aim + np.cumsum(vertical)
+
+        return np.stack([hor + np.cumsum(forward), depth + np.cumsum(aims * forward), aims], axis=1)
+
+    def extend(self, opcodes: np.ndarray, amounts: np.ndarray):
+        """Appends new commands to the index.
+
+        Only the commands since the last checkpoint are replayed, in blocks of `REPLAY_BLOCK_SIZE` commands.
+
+        Args:
+            opcodes: Array of opcodes.
+            amounts: Array of amounts.
+
+        """
+        n_new = self.n_commands + len(opcodes)
+        if n_new > len(self.opcodes):
+            # Grow the buffers geometrically so that many small extensions are amortized O(1)
+            capacity = max(n_new, 2 * len(self.opcodes))
+            self.opcodes = np.resize(self.opcodes, capacity)
+            self.amounts = np.resize(self.amounts, capacity)
+        self.opcodes[self.n_commands:n_new] = opcodes
+        self.amounts[self.n_commands:n_new] = amounts
+
+        # Replay in blocks, so only the states of one block are held at a time
+        last = (len(self.checkpoints) - 1) * self.checkpoint_every
+        state = self.checkpoints[-1]
+        checkpoints = [self.checkpoints]
+        for start in range(last, n_new, REPLAY_BLOCK_SIZE):
+            states = self.replay(state, start, min(start + REPLAY_BLOCK_SIZE, n_new))
+            # States after a multiple of the checkpoint interval, copied so that they don't keep the whole block alive
+            first = (self.checkpoint_every - 1 - (start - last)) % self.checkpoint_every
+            checkpoints.append(states[first::self.checkpoint_every].copy())
+            state = states[-1]
+        self.checkpoints = np.concatenate(checkpoints)
+        self.n_commands = n_new
+
+    def state_at(self, k: int) -> tuple[int, int, int]:
+        """Gets the state after the first k commands.
+
+        Args:
+            k: Number of commands executed.
+
+        Returns:
+            Horizontal position, depth and aim.
+
+        """
+        if not 0 <= k <= self.n_commands:
+            raise IndexError(f"Step {k} is out of range [0, {self.n_commands}]")
+
+        checkpoint, offset = divmod(k, self.checkpoint_every)
+        state = self.checkpoints[checkpoint]
+        if offset:
+            state = self.replay(state, k - offset, k)[-1]
+
+        return tuple(int(x) for x in state)
+
+    def states_between(self, start: int, stop: int) -> np.ndarray:
+        """Gets the states after each number of executed commands in [start, stop).
+
+        Args:
+            start: First number of commands executed.
+            stop: Last number of commands executed, not included.
+
+        Returns:
+            Array of shape (stop - start, 3) with the horizontal positions, depths and aims.
+
+        """
+        if not 0 <= start <= stop <= self.n_commands + 1:
+            raise IndexError(f"Range [{start}, {stop}) is out of range [0, {self.n_commands + 1})")
+        if start == stop:
+            return np.empty((0, 3), dtype=np.int64)
+
+        first = np.array(self.state_at(start), dtype=np.int64)
+
+        return np.concatenate([first[None], self.replay(first, start, stop - 1)])
+
+    def save(self, path: str):
+        """Saves the index to disk."""
+        np.savez(path, opcodes=self.opcodes[:self.n_commands], amounts=self.amounts[:self.n_commands],
+                 checkpoints=self.checkpoints, checkpoint_every=self.checkpoint_every)
+
+    @classmethod
+    def load(cls, path: str) -> 'PositionIndex':
+        """Loads an index saved to disk without replaying the commands."""
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.checkpoint_every = int(data['checkpoint_every'])
+            index.opcodes = data['opcodes']
+            index.amounts = data['amounts']
+            index.checkpoints = data['checkpoints']
+            index.n_commands = len(index.opcodes)
+
+        return index
+
+
 # Part 1
 commands = read_input()
 hor_pos, ver_pos = calculate_position(commands)
@@ -69,3 +370,20 @@ print(f"Multiplication of the horizontal and vertical position is equal to: {hor
 hor_pos, ver_pos = calculate_position_new_instructions(commands)
 print(f"Multiplication of the horizontal and vertical position with the new instructions is equal "
       f"to: {hor_pos * ver_pos}")
+
+
+# Vectorized
+opcodes, amounts = read_input_encoded()
+hor_pos, ver_pos = calculate_position_vectorized(opcodes, amounts)
+print(f"Multiplication of the horizontal and vertical position (vectorized) is equal to: {hor_pos * ver_pos}")
+
+hor_pos, ver_pos = calculate_position_new_instructions_vectorized(opcodes, amounts)
+print(f"Multiplication of the horizontal and vertical position with the new instructions (vectorized) is equal "
+      f"to: {hor_pos * ver_pos}")
+
+
+# Index
+index = PositionIndex(opcodes, amounts, checkpoint_every=100)
+hor_pos, ver_pos, _ = index.state_at(len(index))
+print(f"Multiplication of the horizontal and vertical position with the new instructions (index) is equal "
+      f"to: {hor_pos * ver_pos}")
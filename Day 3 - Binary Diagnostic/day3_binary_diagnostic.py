@@ -1,5 +1,8 @@
+from bisect import bisect_left
 from collections import Counter
 
+import numpy as np
+
 
 def read_input() -> list[str]:
     """Reads input data."""
@@ -112,6 +115,220 @@ def find_least_common_bit_position(bin_nums: list[str]):
     return _find_least_common_bit_position(n_bits_pos)
 
 
+# Bit-packed reports
+def pack_reports(bin_nums: list[str], chunk_size: int = 65536) -> np.ndarray:
+    """Packs binary numbers of the same length into 64-bit words.
+
+    Numbers are left-padded with zeros to a multiple of 64 bits and the words of each number are stored from the most
+    significant to the least significant one, so numbers of up to 64 bits are just their integer value.
+
+    Example:
+        >>> pack_reports(['100', '001', '101'])
+        array([[4],
+               [1],
+               [5]], dtype=uint64)
+
+    Args:
+        bin_nums: List of binary numbers.
+        chunk_size: Number of binary numbers unpacked to bytes at a time.
+
+    Returns:
+        Array of shape (number of binary numbers, number of words).
+
+    """
+    width = len(bin_nums[0])
+    n_words = -(-width // 64)
+    pad = n_words * 64 - width
+    packed = np.empty((len(bin_nums), n_words), dtype=np.uint64)
+    for start in range(0, len(bin_nums), chunk_size):
+        chunk = bin_nums[start:start + chunk_size]
+        bits = np.frombuffer("".join(chunk).encode(), dtype=np.uint8).reshape(len(chunk), width) - ord('0')
+        bits = np.pad(bits, ((0, 0), (pad, 0)))
+        packed[start:start + len(chunk)] = np.packbits(bits, axis=1).view('>u8')
+
+    return packed
+
+
+def count_ones_per_column(packed: np.ndarray, width: int) -> np.ndarray:
+    """Counts the number of ones in each bit position of packed binary numbers.
+
+    Args:
+        packed: Array of packed binary numbers, as returned by `pack_reports`.
+        width: Number of bits of the binary numbers.
+
+    Returns:
+        Array with the number of ones of each position, from the most significant bit to the least significant one.
+
+    """
+    n_words = packed.shape[1]
+    counts = np.empty((n_words, 64), dtype=np.int64)
+    for bit in range(64):
+        counts[:, 63 - bit] = ((packed >> np.uint64(bit)) & np.uint64(1)).sum(axis=0)
+
+    return counts.ravel()[n_words * 64 - width:]
+
+
+def find_rates_packed(packed: np.ndarray, width: int) -> tuple[int, int]:
+    """Finds the gamma and epsilon rates of packed binary numbers.
+
+    Ties are resolved as in `_find_most_common_bit_position` and `_find_least_common_bit_position`, so the epsilon rate
+    is always the complement of the gamma rate.
+
+    Args:
+        packed: Array of packed binary numbers, as returned by `pack_reports`.
+        width: Number of bits of the binary numbers.
+
+    Returns:
+        Gamma and epsilon rates.
+
+    """
+    counts = count_ones_per_column(packed, width)
+    gamma_rate = int("".join('1' if 2 * count >= len(packed) else '0' for count in counts), 2)
+    epsilon_rate = gamma_rate ^ ((1 << width) - 1)
+
+    return gamma_rate, epsilon_rate
+
+
+# Ratings on sorted numbers
+def sort_reports(bin_nums: list[str]) -> np.ndarray | list[int]:
+    """Converts binary numbers to integers and sorts them.
+
+    Numbers of up to 64 bits are stored in a numpy array and longer ones in a list of python integers.
+
+    Args:
+        bin_nums: List of binary numbers.
+
+    Returns:
+        Sorted integers.
+
+    """
+    if len(bin_nums[0]) <= 64:
+        return np.sort(pack_reports(bin_nums).ravel())
+
+    return sorted(int(x, 2) for x in bin_nums)
+
+
+def _bisect_sorted(sorted_nums: np.ndarray | list[int], value: int, lo: int, hi: int) -> int:
+    """Finds the first index in [lo, hi) whose number is larger or equal than `value`."""
+    if isinstance(sorted_nums, np.ndarray):
+        return lo + int(sorted_nums[lo:hi].searchsorted(np.uint64(value)))
+
+    return bisect_left(sorted_nums, value, lo, hi)
+
+
+def find_rating_sorted(sorted_nums: np.ndarray | list[int], width: int, most_common: bool) -> int:
+    """Finds a rating by filtering the numbers by their most or least common bit, one position at a time.
+
+    The numbers that survive the filter always share the bits already processed, so they form a contiguous range of
+    the sorted numbers and the split between zeros and ones in the next position is found with a binary search.
+
+    Args:
+        sorted_nums: Sorted integers, as returned by `sort_reports`.
+        width: Number of bits of the binary numbers.
+        most_common: If True, keeps the most common bit (the oxygen generator rating). Otherwise, keeps the least
+            common bit (the CO2 scrubber rating).
+
+    Returns:
+        Rating.
+
+    """
+    lo, hi = 0, len(sorted_nums)
+    for pos in range(width - 1, -1, -1):
+        if hi - lo == 1:
+            break
+
+        # Numbers with bit 1 in this position are the ones at least as large as the shared prefix plus that bit
+        prefix = (int(sorted_nums[lo]) >> (pos + 1)) << (pos + 1)
+        split = _bisect_sorted(sorted_nums, prefix | (1 << pos), lo, hi)
+        n_zeros, n_ones = split - lo, hi - split
+        if most_common:
+            keep_ones = n_ones >= n_zeros
+        else:
+            keep_ones = n_zeros > n_ones or n_zeros == 0
+
+        if keep_ones and n_ones > 0:
+            lo = split
+        else:
+            hi = split
+
+    return int(sorted_nums[lo])
+
+
+def find_ratings_sorted(bin_nums: list[str]) -> tuple[int, int]:
+    """Finds the oxygen generator and CO2 scrubber ratings.
+
+    Args:
+        bin_nums: List of binary numbers.
+
+    Returns:
+        Oxygen generator and CO2 scrubber ratings.
+
+    """
+    sorted_nums = sort_reports(bin_nums)
+    width = len(bin_nums[0])
+
+    return find_rating_sorted(sorted_nums, width, True), find_rating_sorted(sorted_nums, width, False)
+
+
+# Incremental rates
+class ReportCounter:
+
+    def __init__(self, width: int):
+        """Running count of the ones in each bit position of a stream of binary numbers.
+
+        Args:
+            width: Number of bits of the binary numbers.
+
+        """
+        self.width = width
+        self.ones = np.zeros(width, dtype=np.int64)
+        self.total = 0
+
+    def __repr__(self):
+        return f"ReportCounter(width={self.width}, total={self.total})"
+
+    def _count_ones(self, bin_nums: str | list[str]) -> tuple[np.ndarray, int]:
+        """Counts the ones in each bit position of one or several binary numbers."""
+        if isinstance(bin_nums, str):
+            bin_nums = [bin_nums]
+        if any(len(x) != self.width for x in bin_nums):
+            raise ValueError(f"All the binary numbers must have {self.width} bits")
+
+        bits = np.frombuffer("".join(bin_nums).encode(), dtype=np.uint8).reshape(len(bin_nums), self.width)
+
+        return (bits == ord('1')).sum(axis=0), len(bin_nums)
+
+    def add(self, bin_nums: str | list[str]):
+        """Adds one or several binary numbers to the count."""
+        ones, n = self._count_ones(bin_nums)
+        self.ones += ones
+        self.total += n
+
+    def remove(self, bin_nums: str | list[str]):
+        """Removes one or several binary numbers, previously added, from the count."""
+        ones, n = self._count_ones(bin_nums)
+        if n > self.total or (ones > self.ones).any():
+            raise ValueError("Cannot remove binary numbers that were not added")
+
+        self.ones -= ones
+        self.total -= n
+
+    @property
+    def gamma_rate(self) -> int:
+        """Gamma rate, where ties are resolved to 1 as in `_find_most_common_bit_position`."""
+        return int("".join('1' if 2 * count >= self.total else '0' for count in self.ones), 2)
+
+    @property
+    def epsilon_rate(self) -> int:
+        """Epsilon rate, where ties are resolved to 0 as in `_find_least_common_bit_position`."""
+        return self.gamma_rate ^ ((1 << self.width) - 1)
+
+    @property
+    def power_consumption(self) -> int:
+        """Multiplication of the gamma and epsilon rates."""
+        return self.gamma_rate * self.epsilon_rate
+
+
 reports = read_input()
 
 ###############################################################################
@@ -130,7 +347,7 @@ print(f"Power consumption is equal to {power_consumption}")
 ##################################################################################
 # Part 2
 # Get oxygen generator rating
-bin_numbers = read_input()
+bin_numbers = reports
 for pos in range(len(bin_numbers)):
     gamma_rate = find_most_common_bit_position(bin_numbers)
     most_common_bit = gamma_rate[pos]
@@ -143,7 +360,7 @@ oxygen = int(bin_numbers[0], 2)
 
 
 # Get CO2 scrubber rating
-bin_numbers = read_input()
+bin_numbers = reports
 for pos in range(len(bin_numbers)):
     epsilon_rate = find_least_common_bit_position(bin_numbers)
     least_common_bit = epsilon_rate[pos]
@@ -156,3 +373,19 @@ co2 = int(bin_numbers[0], 2)
 
 life_support = oxygen * co2
 print(f"The life support rating is equal to: {life_support}")
+
+
+##################################################################################
+# Bit-packed
+gamma_rate, epsilon_rate = find_rates_packed(pack_reports(reports), len(reports[0]))
+print(f"Power consumption (bit-packed) is equal to {gamma_rate * epsilon_rate}")
+
+oxygen, co2 = find_ratings_sorted(reports)
+print(f"The life support rating (sorted) is equal to: {oxygen * co2}")
+
+
+##################################################################################
+# Incremental
+report_counter = ReportCounter(len(reports[0]))
+report_counter.add(reports)
+print(f"Power consumption (incremental) is equal to {report_counter.power_consumption}")
@@ -1,7 +1,16 @@
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 import numpy as np
 
 
+BOARDS_MAGIC = b'BNGO'
+BOARDS_HEADER = np.dtype([('magic', 'S4'), ('itemsize', '<u2'), ('n_rows', '<u2'), ('n_cols', '<u2'),
+                          ('reserved', '<u2'), ('n_boards', '<u8')])
+
+
 def read_input() -> tuple[list[int], list[np.ndarray]]:
     """Reads input data."""
     with open("Day 4 - Giant squid/input.txt", 'r') as f:
@@ -144,6 +153,9 @@ def calculate_last_winner_board(drawn: list[int], boards: list[np.ndarray]) -> t
         Last winner board, it's corresponding mask and the last drawn number that made the board win.
 
     """
+    # Copy the list to not pop the boards of the caller
+    boards = list(boards)
+
     # Create masks
     masks = create_mask_boards(boards)
 
@@ -164,18 +176,292 @@ def calculate_last_winner_board(drawn: list[int], boards: list[np.ndarray]) -> t
             return popped_board, popped_mask, number_drawn
 
 
-drawn, boards = read_input()
+def rank_winner_boards(drawn: list[int],
+                       boards: list[np.ndarray] | np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Ranks all the boards by the turn in which they win, without simulating the draws.
+
+    Every cell is mapped to the turn in which its number is drawn. A row or column is complete at the latest turn of
+    its cells and a board wins at the earliest turn of its rows and columns. Boards that never win are left out.
+
+    Args:
+        drawn: Numbers drawn in the bingo.
+        boards: Boards that will play bingo.
+
+    Returns:
+        Indexes of the boards, turns in which they win and their scores, sorted by the turn of victory. Boards winning
+        in the same turn are sorted by index.
+
+    """
+    boards = (np.stack(boards) if isinstance(boards, list) else np.asarray(boards)).astype(np.int64, copy=False)
+    drawn = np.asarray(drawn)
+    n_turns = len(drawn)
+
+    # Turn in which each number is drawn for the first time. Numbers never drawn get a turn after the last one
+    draw_turns = np.full(max(boards.max(), drawn.max()) + 1, n_turns)
+    np.minimum.at(draw_turns, drawn, np.arange(n_turns))
+    cell_turns = draw_turns[boards]
+
+    win_turns = np.minimum(cell_turns.max(axis=2).min(axis=1), cell_turns.max(axis=1).min(axis=1))
+    board_idxs = np.argsort(win_turns, kind='stable')
+    board_idxs = board_idxs[win_turns[board_idxs] < n_turns]
+    win_turns = win_turns[board_idxs]
+
+    # Sum of the numbers not drawn when each board wins
+    unmarked = np.where(cell_turns[board_idxs] > win_turns[:, None, None], boards[board_idxs], 0).sum(axis=(1, 2))
+    scores = unmarked * drawn[win_turns]
+
+    return board_idxs, win_turns, scores
+
+
+def write_boards_binary(path: str, boards: Iterable[np.ndarray], dtype: np.dtype = np.uint8) -> int:
+    """Writes boards to a binary file, one board at a time.
+
+    The file has a header with the shape of the boards followed by all the numbers of the boards as a flat array.
+
+    Args:
+        path: Path to the binary file.
+        boards: Boards that will play bingo. They can be a generator, so they never need to be all in memory.
+        dtype: Type of the numbers, either uint8 or uint16.
+
+    Returns:
+        Number of boards written.
+
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    header = np.zeros(1, dtype=BOARDS_HEADER)
+    header['magic'] = BOARDS_MAGIC
+    header['itemsize'] = dtype.itemsize
+
+    n_boards = 0
+    with open(path, 'wb') as f:
+        header.tofile(f)
+        for board in boards:
+            if n_boards == 0:
+                header['n_rows'], header['n_cols'] = board.shape
+            elif board.shape != (header['n_rows'][0], header['n_cols'][0]):
+                raise ValueError(f"Board {n_boards} has shape {board.shape} instead of "
+                                 f"{(int(header['n_rows'][0]), int(header['n_cols'][0]))}")
+            if board.min() < 0 or board.max() > np.iinfo(dtype).max:
+                raise ValueError(f"Board {n_boards} has numbers that don't fit in {dtype}")
+
+            board.astype(dtype).tofile(f)
+            n_boards += 1
+
+        # Write the final number of boards
+        header['n_boards'] = n_boards
+        f.seek(0)
+        header.tofile(f)
+
+    return n_boards
+
+
+def iter_boards_text(path: str = "Day 4 - Giant Squid/input.txt") -> Iterator[np.ndarray]:
+    """Reads the boards of an input file one at a time, skipping the drawn numbers in the first line."""
+    with open(path, 'r') as f:
+        next(f)
+        rows = []
+        for line in f:
+            if line.strip():
+                rows.append([int(x) for x in line.split()])
+            elif rows:
+                yield np.array(rows)
+                rows = []
+
+        if rows:
+            yield np.array(rows)
+
+
+def open_boards_binary(path: str) -> np.memmap:
+    """Memory-maps the boards of a binary file written by `write_boards_binary`.
+
+    Args:
+        path: Path to the binary file.
+
+    Returns:
+        Array of shape (number of boards, rows, columns).
+
+    """
+    header = np.fromfile(path, dtype=BOARDS_HEADER, count=1)[0]
+    if header['magic'] != BOARDS_MAGIC:
+        raise ValueError(f"{path} is not a binary file of boards")
+
+    dtype = {1: '<u1', 2: '<u2'}[int(header['itemsize'])]
+    shape = (int(header['n_boards']), int(header['n_rows']), int(header['n_cols']))
+
+    return np.memmap(path, dtype=dtype, mode='r', offset=BOARDS_HEADER.itemsize, shape=shape)
+
+
+def rank_block_winners(path: str, drawn: list[int], start: int, stop: int) -> tuple[tuple | None, tuple | None]:
+    """Finds the first and last winners of a block of the boards of a binary file.
+
+    Args:
+        path: Path to the binary file.
+        drawn: Numbers drawn in the bingo.
+        start: Index of the first board of the block.
+        stop: Index after the last board of the block.
+
+    Returns:
+        Win turn, index and score of the first and last winner boards of the block. None if no board wins.
+
+    """
+    board_idxs, win_turns, scores = rank_winner_boards(drawn, open_boards_binary(path)[start:stop])
+    if len(board_idxs) == 0:
+        return None, None
+
+    return ((int(win_turns[0]), start + int(board_idxs[0]), int(scores[0])),
+            (int(win_turns[-1]), start + int(board_idxs[-1]), int(scores[-1])))
+
+
+def run_tournament_binary(path: str, drawn: list[int], block_size: int = 100_000,
+                          n_workers: int | None = None) -> tuple[tuple | None, tuple | None]:
+    """Finds the first and last winners of the boards of a binary file, processing blocks of boards in parallel.
+
+    Only the blocks being processed are loaded in memory, so the boards can be larger than the available memory.
+
+    Args:
+        path: Path to the binary file written by `write_boards_binary`.
+        drawn: Numbers drawn in the bingo.
+        block_size: Number of boards per block.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Win turn, index and score of the first and last winner boards, ranked as in `rank_winner_boards`. None if no
+        board wins.
+
+    """
+    n_boards = len(open_boards_binary(path))
+    starts = list(range(0, n_boards, block_size))
+    stops = [min(start + block_size, n_boards) for start in starts]
+
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+        results = list(executor.map(rank_block_winners, [path] * len(starts), [drawn] * len(starts), starts, stops))
+
+    firsts = [first for first, _ in results if first is not None]
+    lasts = [last for _, last in results if last is not None]
+    if not firsts:
+        return None, None
+
+    # Ties are broken by board index, the lowest for the first winner and the highest for the last one
+    return min(firsts, key=lambda x: x[:2]), max(lasts, key=lambda x: x[:2])
+
+
+class BingoEngine:
+
+    def __init__(self, boards: list[np.ndarray] | np.ndarray):
+        """Bingo played on all the boards at once.
+
+        The boards are stacked in a single (N, 5, 5) array and an inverted index from each number to the cells that
+        contain it is built, so every drawn number only touches those cells. Each board keeps a counter of the marked
+        cells of every row and column, and wins as soon as one of them reaches the size of the board.
+
+        Args:
+            boards: Boards that will play bingo.
+
+        """
+        self.boards = np.stack(boards) if isinstance(boards, list) else np.asarray(boards)
+        self.n_boards, self.n_rows, self.n_cols = self.boards.shape
+
+        # Inverted index: the cells of each number are a contiguous range of the sorted cells
+        flat = self.boards.ravel()
+        self.cells_by_number = np.argsort(flat, kind='stable')
+        self.sorted_numbers = flat[self.cells_by_number]
+
+        self.reset()
+
+    def __repr__(self):
+        return f"BingoEngine(n_boards={self.n_boards}, n_winners={len(self.winners)})"
+
+    def reset(self):
+        """Clears all the marked numbers."""
+        self.masks = np.zeros(self.boards.shape, dtype=bool)
+        self.row_hits = np.zeros((self.n_boards, self.n_rows), dtype=np.int16)
+        self.col_hits = np.zeros((self.n_boards, self.n_cols), dtype=np.int16)
+        self.won = np.zeros(self.n_boards, dtype=bool)
+        self.winners = []
+
+    def find_cells(self, number: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Finds the board, row and column of all the cells that contain a number."""
+        lo, hi = self.sorted_numbers.searchsorted([number, number + 1])
+
+        return np.unravel_index(self.cells_by_number[lo:hi], self.boards.shape)
+
+    def draw(self, number_drawn: int) -> np.ndarray:
+        """Marks a drawn number on all the boards.
+
+        Args:
+            number_drawn: Number that has been drawn in the bingo.
+
+        Returns:
+            Indexes of the boards that won with this number, sorted.
+
+        """
+        b, r, c = self.find_cells(number_drawn)
+
+        # Ignore cells already marked by a repeated number
+        new = ~self.masks[b, r, c]
+        b, r, c = b[new], r[new], c[new]
+
+        self.masks[b, r, c] = True
+        np.add.at(self.row_hits, (b, r), 1)
+        np.add.at(self.col_hits, (b, c), 1)
+
+        complete = (self.row_hits[b, r] == self.n_cols) | (self.col_hits[b, c] == self.n_rows)
+        new_winners = np.unique(b[complete])
+        new_winners = new_winners[~self.won[new_winners]]
+        self.won[new_winners] = True
+        self.winners.extend((int(i), number_drawn) for i in new_winners)
+
+        return new_winners
+
+    def calculate_score(self, board_idx: int, winner_number: int) -> int:
+        """Calculates the score of a board with the numbers marked so far."""
+        return calculate_score_board(self.boards[board_idx], self.masks[board_idx], winner_number)
+
+    def play(self, drawn: Iterable[int]) -> Iterator[tuple[int, int, int]]:
+        """Draws numbers until all the boards have won.
+
+        Args:
+            drawn: Numbers drawn in the bingo.
+
+        Yields:
+            Index of each winner board, the number that made it win and its score, in order of victory.
+
+        """
+        for number_drawn in drawn:
+            for board_idx in self.draw(number_drawn):
+                yield int(board_idx), number_drawn, self.calculate_score(board_idx, number_drawn)
+
+            if self.won.all():
+                return
+
+
+if __name__ == "__main__":
+    drawn, boards = read_input()
+
+    # First part
+    first_winner_board, first_winner_mask, first_winner_number = calculate_first_winner_board(drawn, boards)
+    first_winner_score = calculate_score_board(first_winner_board, first_winner_mask, first_winner_number)
+
+    print(f"The score of the first winner board is equal to {first_winner_score}")
 
+    # Second part
+    last_winner_board, last_winner_mask, last_winner_number = calculate_last_winner_board(drawn, boards)
+    last_winner_score = calculate_score_board(last_winner_board, last_winner_mask, last_winner_number)
 
-# First part
-first_winner_board, first_winner_mask, first_winner_number = calculate_first_winner_board(drawn, boards)
-first_winner_score = calculate_score_board(first_winner_board, first_winner_mask, first_winner_number)
+    print(f"The score of the last winner board is equal to {last_winner_score}")
 
-print(f"The score of the first winner board is equal to {first_winner_score}")
+    # Engine
+    winners = list(BingoEngine(boards).play(drawn))
+    print(f"The score of the first and last winner boards (engine) is equal to {winners[0][2]} and {winners[-1][2]}")
 
+    # Closed form
+    _, _, scores = rank_winner_boards(drawn, boards)
+    print(f"The score of the first and last winner boards (closed form) is equal to {scores[0]} and {scores[-1]}")
 
-# Second part
-last_winner_board, last_winner_mask, last_winner_number = calculate_last_winner_board(drawn, boards)
-last_winner_score = calculate_score_board(last_winner_board, last_winner_mask, last_winner_number)
+    # Binary boards
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        boards_path = os.path.join(tmp_dir, "boards.bin")
+        write_boards_binary(boards_path, iter_boards_text())
+        (_, _, first_score), (_, _, last_score) = run_tournament_binary(boards_path, drawn, block_size=10)
 
-print(f"The score of the last winner board is equal to {last_winner_score}")
+    print(f"The score of the first and last winner boards (binary) is equal to {first_score} and {last_score}")
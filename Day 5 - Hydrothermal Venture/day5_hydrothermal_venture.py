@@ -1,3 +1,8 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy as np
 
 
@@ -141,19 +146,328 @@ def find_points_overlap(diagram: np.ndarray, n_lines: int):
     return (diagram >= n_lines).sum()
 
 
-ends = read_input()
+def lines_to_array(ends: list[Line]) -> np.ndarray:
+    """Converts a list of segment lines to an array of shape (N, 4), where each row is x1, y1, x2, y2."""
+    return np.array([[line.p1.x, line.p1.y, line.p2.x, line.p2.y] for line in ends], dtype=np.int64).reshape(-1, 4)
+
+
+def read_input_array(path: str = "Day 5 - Hydrothermal Venture/input.txt") -> np.ndarray:
+    """Reads input data at once as an array of shape (N, 4), where each row is x1, y1, x2, y2."""
+    with open(path, 'r') as f:
+        text = f.read().replace('->', ' ').replace(',', ' ')
+
+    return np.fromstring(text, dtype=np.int64, sep=' ').reshape(-1, 4)
+
+
+def find_segment_cells(segments: np.ndarray, include_diagonal: bool) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the coordinates of all the points that compose the segments, without a loop over the segments.
+
+    Every segment is walked from its first end with a step of -1, 0 or 1 in each axis, so vertical, horizontal and
+    diagonal segments are handled by the same arithmetic.
+
+    Args:
+        segments: Array of segments of shape (N, 4), where each row is x1, y1, x2, y2.
+        include_diagonal: If True, diagonal segments are included.
+
+    Returns:
+        Arrays with the x and y coordinates of the points, repeated once per segment that covers them.
+
+    """
+    x1, y1, x2, y2 = segments.T
+    if not include_diagonal:
+        straight = (x1 == x2) | (y1 == y2)
+        x1, y1, x2, y2 = x1[straight], y1[straight], x2[straight], y2[straight]
+
+    step_x = np.sign(x2 - x1)
+    step_y = np.sign(y2 - y1)
+    lengths = np.maximum(abs(x2 - x1), abs(y2 - y1)) + 1
+
+    # Position of each point inside its segment
+    seg_idx = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    return x1[seg_idx] + step_x[seg_idx] * offsets, y1[seg_idx] + step_y[seg_idx] * offsets
+
+
+def fill_diagram_vectorized(segments: np.ndarray, include_diagonal: bool) -> np.ndarray:
+    """Fills a diagram with the same shape as the one of `build_diagram` given an array of segments.
+
+    Args:
+        segments: Array of segments of shape (N, 4), where each row is x1, y1, x2, y2.
+        include_diagonal: If True, diagonal segments are included.
+
+    Returns:
+        Diagram with the number of segments that cover each point.
+
+    """
+    shape = (segments[:, [0, 2]].max() + 1, segments[:, [1, 3]].max() + 1)
+    xs, ys = find_segment_cells(segments, include_diagonal)
 
+    return np.bincount(xs * shape[1] + ys, minlength=shape[0] * shape[1]).reshape(shape)
 
-# Part 1
-diagram = build_diagram(ends)
-diagram = fill_diagram(diagram, ends, include_diagonal=False)
-points_overlap = find_points_overlap(diagram, n_lines=2)
 
-print(f"The number of points where at least two vertical or horizontal lines overlap is equal two: {points_overlap}")
+def find_points_overlap_sparse(segments: np.ndarray, n_lines: int, include_diagonal: bool) -> int:
+    """Finds in how many points there are at least `n_lines` that overlap, without building a diagram.
 
-# Part 2
-diagram = build_diagram(ends)
-diagram = fill_diagram(diagram, ends, include_diagonal=True)
-points_overlap = find_points_overlap(diagram, n_lines=2)
+    The covered points are encoded as integers and sorted, so the number of segments over each point is the length of
+    its run. Memory is proportional to the number of covered points instead of to the area of the diagram.
+
+    Args:
+        segments: Array of segments of shape (N, 4), where each row is x1, y1, x2, y2.
+        n_lines: Minimum number of overlapping lines.
+        include_diagonal: If True, diagonal segments are included.
+
+    Returns:
+        Number of points with at least `n_lines` overlapping lines.
+
+    """
+    if n_lines <= 0:
+        # Every point of the diagram counts, covered or not
+        return int((segments[:, [0, 2]].max() + 1) * (segments[:, [1, 3]].max() + 1))
+
+    xs, ys = find_segment_cells(segments, include_diagonal)
+    if len(xs) == 0:
+        return 0
+
+    min_y = ys.min()
+    cells = (xs - xs.min()) * (ys.max() - min_y + 1) + (ys - min_y)
+    cells.sort()
+
+    # Length of the runs of equal cells
+    run_starts = np.flatnonzero(np.diff(cells, prepend=cells[0] - 1))
+    run_lengths = np.diff(run_starts, append=len(cells))
+
+    return int((run_lengths >= n_lines).sum())
+
+
+class VentField:
+
+    def __init__(self, n_lines: int = 2, include_diagonal: bool = True):
+        """Diagram of segment lines that can be added and removed, keeping the number of overlapping points up to date.
+
+        Only the points covered by a changed line are updated. The index used for the queries on rectangles is only
+        rebuilt when it's needed after a change.
+
+        Args:
+            n_lines: Minimum number of lines for a point to be an overlap.
+            include_diagonal: If True, diagonal segments are included.
+
+        """
+        self.n_lines = n_lines
+        self.include_diagonal = include_diagonal
+        self.lines = Counter()
+        self.diagram = Counter()
+        self.n_overlaps = 0
+
+        # Prefix sums of the overlaps, rebuilt lazily
+        self._prefix = None
+        self._origin = (0, 0)
+
+    def __repr__(self):
+        return f"VentField(n_lines={self.n_lines}, n_segments={self.lines.total()}, n_overlaps={self.n_overlaps})"
+
+    @staticmethod
+    def _line_key(line: Line) -> tuple:
+        """Key of a line that doesn't depend on the order of its end points."""
+        return tuple(sorted(line.to_tuple()))
+
+    def add_line(self, line: Line):
+        """Adds a segment line to the diagram."""
+        for p in line.find_segment_points(self.include_diagonal):
+            point = p.to_tuple()
+            self.diagram[point] += 1
+            if self.diagram[point] == self.n_lines:
+                self.n_overlaps += 1
+
+        self.lines[self._line_key(line)] += 1
+        self._prefix = None
+
+    def remove_line(self, line: Line):
+        """Removes a segment line, previously added, from the diagram."""
+        key = self._line_key(line)
+        if self.lines[key] == 0:
+            raise ValueError(f"{line} is not in the diagram")
+
+        for p in line.find_segment_points(self.include_diagonal):
+            point = p.to_tuple()
+            if self.diagram[point] == self.n_lines:
+                self.n_overlaps -= 1
+            self.diagram[point] -= 1
+            if self.diagram[point] == 0:
+                del self.diagram[point]
+
+        self.lines[key] -= 1
+        if self.lines[key] == 0:
+            del self.lines[key]
+        self._prefix = None
+
+    def _build_prefix(self):
+        """Builds the 2D prefix sums of the overlapping points over their bounding box."""
+        overlaps = np.array([point for point, count in self.diagram.items() if count >= self.n_lines],
+                            dtype=np.int64).reshape(-1, 2)
+        if len(overlaps) == 0:
+            self._origin = (0, 0)
+            self._prefix = np.zeros((1, 1), dtype=np.int64)
+            return
+
+        self._origin = tuple(overlaps.min(axis=0))
+        xs, ys = (overlaps - self._origin).T
+        grid = np.zeros((xs.max() + 1, ys.max() + 1), dtype=np.int64)
+        grid[xs, ys] = 1
+
+        self._prefix = np.zeros((grid.shape[0] + 1, grid.shape[1] + 1), dtype=np.int64)
+        self._prefix[1:, 1:] = grid.cumsum(axis=0).cumsum(axis=1)
+
+    def count_overlaps_in(self, x_min: int, y_min: int, x_max: int, y_max: int) -> int:
+        """Counts the overlapping points inside a rectangle, including its borders."""
+        if self._prefix is None:
+            self._build_prefix()
+
+        # Clip the rectangle to the prefix sums
+        x_min, x_max = [min(max(x - self._origin[0], 0), self._prefix.shape[0] - 1) for x in (x_min, x_max + 1)]
+        y_min, y_max = [min(max(y - self._origin[1], 0), self._prefix.shape[1] - 1) for y in (y_min, y_max + 1)]
+        if x_min >= x_max or y_min >= y_max:
+            return 0
+
+        p = self._prefix
+        return int(p[x_max, y_max] - p[x_min, y_max] - p[x_max, y_min] + p[x_min, y_min])
+
+
+def clip_segments_rows(segments: np.ndarray, x_start: int, x_stop: int) -> np.ndarray:
+    """Clips segments to the rows of the diagram in [x_start, x_stop).
+
+    Args:
+        segments: Array of segments of shape (N, 4), where each row is x1, y1, x2, y2. All of them must have at least
+            one point inside the rows.
+        x_start: First row.
+        x_stop: Row after the last one.
+
+    Returns:
+        Array of the clipped segments, with the same orientation as the original ones.
+
+    """
+    x1, y1, x2, y2 = segments.T
+    step_x = np.sign(x2 - x1)
+    step_y = np.sign(y2 - y1)
+    last = np.maximum(abs(x2 - x1), abs(y2 - y1))
+
+    # Range of positions inside each segment whose points fall in the rows
+    first_pos = np.select([step_x > 0, step_x < 0], [x_start - x1, x1 - (x_stop - 1)], 0).clip(min=0)
+    last_pos = np.minimum(np.select([step_x > 0, step_x < 0], [x_stop - 1 - x1, x1 - x_start], last), last)
+
+    return np.stack([x1 + step_x * first_pos, y1 + step_y * first_pos,
+                     x1 + step_x * last_pos, y1 + step_y * last_pos], axis=1)
+
+
+def fill_diagram_tile(shm_name: str, shape: tuple[int, int], x_start: int, x_stop: int, segments: np.ndarray):
+    """Fills the rows in [x_start, x_stop) of a diagram in shared memory given the segments that cross them.
+
+    Args:
+        shm_name: Name of the shared memory block of the diagram.
+        shape: Shape of the diagram.
+        x_start: First row of the tile.
+        x_stop: Row after the last one of the tile.
+        segments: Array of segments of shape (N, 4) with at least one point in the tile.
+
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        diagram = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+        xs, ys = find_segment_cells(clip_segments_rows(segments, x_start, x_stop), include_diagonal=True)
+        tile_shape = (x_stop - x_start, shape[1])
+        diagram[x_start:x_stop] += np.bincount((xs - x_start) * shape[1] + ys,
+                                               minlength=tile_shape[0] * tile_shape[1]).reshape(tile_shape)
+        del diagram
+    finally:
+        shm.close()
+
+
+def fill_diagram_parallel(segments: np.ndarray, include_diagonal: bool, n_tiles: int | None = None,
+                          n_workers: int | None = None) -> np.ndarray:
+    """Fills a diagram with the same shape as the one of `build_diagram` using a pool of processes.
+
+    The diagram lives in shared memory and is split in tiles of rows. Each segment is clipped to the tiles it
+    crosses, so every process writes to its own tile and no locks are needed.
+
+    Args:
+        segments: Array of segments of shape (N, 4), where each row is x1, y1, x2, y2.
+        include_diagonal: If True, diagonal segments are included.
+        n_tiles: Number of tiles. Defaults to the number of processes.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Diagram with the number of segments that cover each point.
+
+    """
+    shape = (int(segments[:, [0, 2]].max()) + 1, int(segments[:, [1, 3]].max()) + 1)
+    if not include_diagonal:
+        segments = segments[(segments[:, 0] == segments[:, 2]) | (segments[:, 1] == segments[:, 3])]
+
+    n_workers = n_workers or os.cpu_count() or 1
+    n_tiles = min(n_tiles or n_workers, shape[0])
+    bounds = [shape[0] * i // n_tiles for i in range(n_tiles + 1)]
+    seg_x_min = segments[:, [0, 2]].min(axis=1)
+    seg_x_max = segments[:, [0, 2]].max(axis=1)
+
+    shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * np.dtype(np.int64).itemsize)
+    try:
+        diagram = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+        diagram[:] = 0
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = []
+            for x_start, x_stop in zip(bounds[:-1], bounds[1:]):
+                crossing = (seg_x_min < x_stop) & (seg_x_max >= x_start)
+                futures.append(executor.submit(fill_diagram_tile, shm.name, shape, x_start, x_stop,
+                                               segments[crossing]))
+            for future in futures:
+                future.result()
+
+        result = diagram.copy()
+        del diagram
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return result
+
+
+if __name__ == "__main__":
+    ends = read_input()
+
+    # Part 1
+    diagram = build_diagram(ends)
+    diagram = fill_diagram(diagram, ends, include_diagonal=False)
+    points_overlap = find_points_overlap(diagram, n_lines=2)
+
+    print(f"The number of points where at least two vertical or horizontal lines overlap is equal two: "
+          f"{points_overlap}")
+
+    # Part 2
+    diagram = build_diagram(ends)
+    diagram = fill_diagram(diagram, ends, include_diagonal=True)
+    points_overlap = find_points_overlap(diagram, n_lines=2)
+
+    print(f"The number of points where at least two lines overlap is equal two: {points_overlap}")
+
+    # Vectorized
+    segments = read_input_array()
+    points_overlap = find_points_overlap(fill_diagram_vectorized(segments, include_diagonal=False), n_lines=2)
+    print(f"The number of points where at least two vertical or horizontal lines overlap (vectorized) is equal two: "
+          f"{points_overlap}")
+
+    points_overlap = find_points_overlap(fill_diagram_vectorized(segments, include_diagonal=True), n_lines=2)
+    print(f"The number of points where at least two lines overlap (vectorized) is equal two: {points_overlap}")
+
+    # Sparse
+    points_overlap = find_points_overlap_sparse(segments, n_lines=2, include_diagonal=True)
+    print(f"The number of points where at least two lines overlap (sparse) is equal two: {points_overlap}")
+
+    # Dynamic
+    vent_field = VentField(n_lines=2, include_diagonal=True)
+    for line in ends:
+        vent_field.add_line(line)
+    print(f"The number of points where at least two lines overlap (dynamic) is equal two: {vent_field.n_overlaps}")
 
-print(f"The number of points where at least two lines overlap is equal two: {points_overlap}")
+    # Parallel
+    points_overlap = find_points_overlap(fill_diagram_parallel(segments, include_diagonal=True), n_lines=2)
+    print(f"The number of points where at least two lines overlap (parallel) is equal two: {points_overlap}")
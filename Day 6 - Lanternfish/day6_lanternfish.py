@@ -1,5 +1,7 @@
-# import numpy as np
 from copy import copy
+from functools import lru_cache
+
+import numpy as np
 
 
 # ####################################################################################
@@ -164,6 +166,121 @@ def simulate_days(days: int, fishes: list[int]) -> int:
 
     return sum(counter_fish.values())
 
+
+def build_transition_matrix() -> tuple[tuple[int, ...], ...]:
+    """Builds the matrix that passes one day, where element (i, j) is the number of fishes with timer i tomorrow for
+    every fish with timer j today."""
+    matrix = [[0] * 9 for _ in range(9)]
+    for timer in range(8):
+        matrix[timer][timer + 1] = 1
+
+    # Fishes with timer 0 restart their timer and spawn a new fish
+    matrix[6][0] = 1
+    matrix[8][0] = 1
+
+    return tuple(tuple(row) for row in matrix)
+
+
+def multiply_matrices(a: tuple[tuple[int, ...], ...], b: tuple[tuple[int, ...], ...]) -> tuple[tuple[int, ...], ...]:
+    """Multiplies two square matrices of python integers."""
+    return tuple(tuple(sum(a_ik * b_kj for a_ik, b_kj in zip(row, col)) for col in zip(*b)) for row in a)
+
+
+@lru_cache(maxsize=None)
+def transition_power_of_two(exponent: int) -> tuple[tuple[int, ...], ...]:
+    """Gets the matrix that passes 2**exponent days. Powers are cached, so they are shared by all the simulations."""
+    if exponent == 0:
+        return build_transition_matrix()
+
+    half = transition_power_of_two(exponent - 1)
+
+    return multiply_matrices(half, half)
+
+
+def simulate_days_matrix(days: int, fishes: list[int]) -> int:
+    """Simulate `days` days given a list of lanternfish timers, in logarithmic time.
+
+    The counts of fishes by timer are multiplied by the transition matrix raised to each power of two in the binary
+    representation of `days`. All the numbers are python integers, so the result is exact for any number of days.
+
+    Args:
+        days: Number of days to simulate.
+        fishes: list of Lanternfish timers.
+
+    Returns:
+        Number of lanternfish at the end of the last simulated day.
+
+    """
+    counter_fish = [0] * 9
+    for fish in fishes:
+        counter_fish[fish] += 1
+
+    exponent = 0
+    while days:
+        if days & 1:
+            matrix = transition_power_of_two(exponent)
+            counter_fish = [sum(m * c for m, c in zip(row, counter_fish)) for row in matrix]
+        days >>= 1
+        exponent += 1
+
+    return sum(counter_fish)
+
+
+def count_timers(scenarios: list[list[int]], newborn_timer: int = 8) -> np.ndarray:
+    """Counts the lanternfish of each scenario by timer.
+
+    Args:
+        scenarios: List of scenarios, each one a list of Lanternfish timers.
+        newborn_timer: Timer of a newborn lanternfish, which is the largest possible timer.
+
+    Returns:
+        Array of shape (number of scenarios, newborn_timer + 1).
+
+    """
+    counts = np.zeros((len(scenarios), newborn_timer + 1), dtype=np.int64)
+    for i, fishes in enumerate(scenarios):
+        if len(fishes) and max(fishes) > newborn_timer:
+            raise ValueError(f"Timers of scenario {i} can't be larger than {newborn_timer}")
+        counts[i] = np.bincount(fishes, minlength=newborn_timer + 1)
+
+    return counts
+
+
+def simulate_days_batch(days: int, counts: np.ndarray, reset_timer: int = 6) -> np.ndarray:
+    """Simulate `days` days for many scenarios at once, given their counts of lanternfish by timer.
+
+    The counts are stored as int64 while the populations can't overflow and switch to python integers otherwise.
+
+    Args:
+        days: Number of days to simulate.
+        counts: Array of shape (number of scenarios, newborn timer + 1), as returned by `count_timers`.
+        reset_timer: Timer of a lanternfish after it spawns a new fish.
+
+    Returns:
+        Array of shape (days, number of scenarios) with the number of lanternfish at the end of each simulated day.
+
+    """
+    if not 0 <= reset_timer < counts.shape[1]:
+        raise ValueError(f"The reset timer must be between 0 and {counts.shape[1] - 1}, got {reset_timer}")
+
+    counts = counts.copy()
+    trajectory = np.zeros((days, counts.shape[0]), dtype=counts.dtype)
+    for day in range(days):
+        # The population at most doubles in a day
+        if counts.dtype != object and counts.sum(axis=1).max(initial=0) > np.iinfo(np.int64).max // 2:
+            counts = counts.astype(object)
+            trajectory = trajectory.astype(object)
+
+        # Fishes with timer 0 become newborns in the last position and restart their own timer
+        spawning = counts[:, 0].copy()
+        counts = np.roll(counts, -1, axis=1)
+        counts[:, reset_timer] += spawning
+
+        trajectory[day] = counts.sum(axis=1)
+
+    return trajectory
+
+
 lanternfishes = read_input()
 
 
@@ -179,3 +296,16 @@ day_to_simulate = 256
 n_fishes = simulate_days(256, lanternfishes)
 
 print(f"The number of lanternfish after {day_to_simulate} days is equal to: {n_fishes}")
+
+
+# Matrix exponentiation
+for day_to_simulate in (80, 256):
+    n_fishes = simulate_days_matrix(day_to_simulate, lanternfishes)
+
+    print(f"The number of lanternfish after {day_to_simulate} days (matrix) is equal to: {n_fishes}")
+
+
+# Batch
+trajectory = simulate_days_batch(256, count_timers([lanternfishes]))
+print(f"The number of lanternfish after 80 and 256 days (batch) is equal to: {trajectory[79, 0]} and "
+      f"{trajectory[255, 0]}")
@@ -1,6 +1,15 @@
+from collections.abc import Callable
+
 import numpy as np
 
 
+FUEL_FUNCTIONS = {
+    'linear': lambda distances: distances,
+    'triangular': lambda distances: distances * (distances + 1) // 2,
+    'quadratic': lambda distances: distances ** 2,
+}
+
+
 def read_input():
     """Reads input data."""
     with open("Day 7 - The Treachery of Wales/input.txt", 'r') as f:
@@ -46,6 +55,142 @@ def find_min_cost_crab_strategy(positions: np.ndarray) -> int:
     return min_cost
 
 
+def calculate_total_fuel_cost(positions: np.ndarray, target: int, fuel_function: Callable) -> int | float:
+    """Calculates the fuel cost of aligning all the crabs to a position, given the fuel cost of each distance."""
+    return fuel_function(abs(positions - target)).sum()
+
+
+def find_min_cost_convex(positions: np.ndarray, fuel: str | Callable = 'linear') -> tuple[int | float, int]:
+    """Finds the minimum fuel cost for any convex fuel function, without trying all the positions.
+
+    The total cost is convex in the target position if the fuel function is convex and non-decreasing on the
+    distance, so the first position whose cost is not larger than the cost of the next one is the optimum and it's
+    found with a binary search. The linear cost is minimized at the median, and the triangular and quadratic costs
+    within one position of the mean.
+
+    Args:
+        positions: Positions of the crabs.
+        fuel: Name of a function in `FUEL_FUNCTIONS` or a function that returns the fuel cost of each element of an
+            array of distances.
+
+    Returns:
+        Minimum fuel cost and the position where it's reached.
+
+    Example:
+        >>> find_min_cost_convex(np.repeat([0, 2_000_000], 5_000_000), 'quadratic')
+        (10000000000000000000, 1000000)
+
+    """
+    fuel_function = FUEL_FUNCTIONS[fuel] if isinstance(fuel, str) else fuel
+    min_pos = int(np.min(positions))
+    max_pos = int(np.max(positions))
+
+    # Use python integers if the costs could overflow
+    span = max_pos - min_pos + 1
+    crab_positions = positions if len(positions) * span ** 2 < np.iinfo(np.int64).max else positions.astype(object)
+
+    if fuel == 'linear':
+        candidates = [int(np.partition(positions, (len(positions) - 1) // 2)[(len(positions) - 1) // 2])]
+    elif fuel in ('triangular', 'quadratic'):
+        mean = int(np.floor(np.mean(positions)))
+        candidates = range(max(mean - 1, min_pos), min(mean + 2, max_pos) + 1)
+    else:
+        lo, hi = min_pos, max_pos
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if calculate_total_fuel_cost(crab_positions, mid, fuel_function) <= \
+                    calculate_total_fuel_cost(crab_positions, mid + 1, fuel_function):
+                hi = mid
+            else:
+                lo = mid + 1
+        candidates = [lo]
+
+    return min((calculate_total_fuel_cost(crab_positions, target, fuel_function), target) for target in candidates)
+
+
+class CrabAlignment:
+
+    def __init__(self, positions: np.ndarray):
+        """Fuel costs of aligning crabs to any position, from a histogram of their positions.
+
+        The cumulative counts and sums of the histogram give the linear cost of any target in O(1). The crab strategy
+        cost of a distance d is (d**2 + d) / 2, so it also needs the sum of the squared distances, which only depends
+        on the total count, sum and sum of squares of the positions.
+
+        Args:
+            positions: Positions of the crabs.
+
+        """
+        self.min_pos = int(np.min(positions))
+        self.max_pos = int(np.max(positions))
+        self.n_crabs = len(positions)
+
+        # Positions relative to the minimum one, so the histogram starts at 0
+        hist = np.bincount(np.asarray(positions) - self.min_pos)
+        offsets = np.arange(len(hist))
+        self.counts_le = np.cumsum(hist)
+        self.sums_le = np.cumsum(hist * offsets)
+        self.total_sum = int(self.sums_le[-1])
+        # Python integers, as the sum of squares overflows int64 long before the costs of the linear strategy
+        self.total_sum_squares = int(np.dot(hist.astype(object), offsets.astype(object) ** 2))
+
+        # Use python integers if the costs could overflow
+        span = self.max_pos - self.min_pos + 1
+        self.dtype = np.int64 if self.n_crabs * span ** 2 < np.iinfo(np.int64).max else object
+
+    def __repr__(self):
+        return f"CrabAlignment(n_crabs={self.n_crabs}, min_pos={self.min_pos}, max_pos={self.max_pos})"
+
+    def _costs(self, targets: np.ndarray, crab_strategy: bool) -> np.ndarray:
+        """Calculates the costs of targets given relative to the minimum position."""
+        idxs = np.clip(targets.astype(np.int64), -1, len(self.counts_le) - 1)
+        counts_le = np.where(idxs >= 0, self.counts_le[np.maximum(idxs, 0)], 0).astype(self.dtype)
+        sums_le = np.where(idxs >= 0, self.sums_le[np.maximum(idxs, 0)], 0).astype(self.dtype)
+
+        # Crabs at or below the target move up, the rest move down
+        linear = targets * counts_le - sums_le + (self.total_sum - sums_le) - targets * (self.n_crabs - counts_le)
+        if not crab_strategy:
+            return linear
+
+        squares = self.total_sum_squares - 2 * targets * self.total_sum + self.n_crabs * targets ** 2
+
+        return (squares + linear) // 2
+
+    def cost_at(self, target: int, crab_strategy: bool = False) -> int:
+        """Calculates the fuel cost of aligning all the crabs to a position.
+
+        Args:
+            target: Position to align the crabs to.
+            crab_strategy: If True, uses the crab strategy cost, where each step costs one more than the previous one.
+
+        Returns:
+            Fuel cost.
+
+        Example:
+            >>> CrabAlignment(np.repeat([0, 2_000_000], 5_000_000)).cost_at(0, crab_strategy=True)
+            10000005000000000000
+
+        """
+        # A single cost is calculated with python integers, as the target can be far from the crabs
+        return int(self._costs(np.array([target - self.min_pos], dtype=object), crab_strategy)[0])
+
+    def costs(self, crab_strategy: bool = False) -> np.ndarray:
+        """Calculates the fuel cost of aligning all the crabs to every position between the minimum and the maximum.
+
+        Args:
+            crab_strategy: If True, uses the crab strategy cost, where each step costs one more than the previous one.
+
+        Returns:
+            Array with the fuel cost of each position.
+
+        """
+        return self._costs(np.arange(self.max_pos - self.min_pos + 1).astype(self.dtype), crab_strategy)
+
+    def find_min_cost(self, crab_strategy: bool = False) -> int:
+        """Finds the minimum fuel cost of aligning all the crabs."""
+        return int(self.costs(crab_strategy).min())
+
+
 positions = read_input()
 
 # Part 1
@@ -58,3 +203,18 @@ print(f"The minimum amount of fuel is equal to: {min_cost}")
 min_cost = find_min_cost_crab_strategy(positions)
 
 print(f"The minimum amount of fuel using the crab strategy is equal to: {min_cost}")
+
+
+# Prefix sums
+crab_alignment = CrabAlignment(positions)
+print(f"The minimum amount of fuel (prefix sums) is equal to: {crab_alignment.find_min_cost()}")
+print(f"The minimum amount of fuel using the crab strategy (prefix sums) is equal to: "
+      f"{crab_alignment.find_min_cost(crab_strategy=True)}")
+
+
+# Convex optimizer
+min_cost, _ = find_min_cost_convex(positions, 'linear')
+print(f"The minimum amount of fuel (convex) is equal to: {min_cost}")
+
+min_cost, _ = find_min_cost_convex(positions, 'triangular')
+print(f"The minimum amount of fuel using the crab strategy (convex) is equal to: {min_cost}")
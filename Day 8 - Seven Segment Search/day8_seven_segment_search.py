@@ -1,3 +1,15 @@
+import os
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
+# Segments of each digit in a seven-segment display, where segments are named from 'a' to 'g' from top to bottom and
+# from left to right
+SEVEN_SEGMENT_FONT = ['abcefg', 'cf', 'acdeg', 'acdfg', 'bcdf', 'abdfg', 'abdefg', 'acf', 'abcdefg', 'abcdfg']
+
+
 def read_input() -> tuple[list, list]:
     """Reads input data."""
     with open("Day 8 - Seven Segment Search/input.txt", 'r') as f:
@@ -23,16 +35,6 @@ def count_easy_digits(digits):
     return n_easy
 
 
-signals, digits = read_input()
-
-
-# Part 1
-
-n_easy_digits = count_easy_digits(digits)
-
-print(f"The number of easy digits is equal to {n_easy_digits}")
-
-
 # Part 2
 
 class Display:
@@ -191,6 +193,422 @@ def add_all_numbers(signals, digits):
     return total
 
 
-total_amount = add_all_numbers(signals, digits)
+# Bitmask decoder
+
+def encode_pattern(pattern: str) -> int:
+    """Encodes a pattern of segments as an integer, where bit i is set if the segment i (from 'a') is on."""
+    mask = 0
+    for segment in pattern:
+        mask |= 1 << (ord(segment) - ord('a'))
+
+    return mask
+
+
+def count_segments(masks: list[int], n_segments: int = 7) -> list[int]:
+    """Counts in how many patterns each segment is on."""
+    return [sum((mask >> segment) & 1 for mask in masks) for segment in range(n_segments)]
+
+
+def calculate_signature(mask: int, segment_counts: list[int]) -> int:
+    """Calculates the signature of a pattern as the sum of the counts of its segments."""
+    signature = 0
+    while mask:
+        segment = mask.bit_length() - 1
+        signature += segment_counts[segment]
+        mask ^= 1 << segment
+
+    return signature
+
+
+def build_signature_table(font: list[str]) -> dict[int, int]:
+    """Builds the table from the signature of each digit to the digit.
+
+    The number of digits in which a segment is on doesn't change when the wires are scrambled, so neither does the sum
+    of these numbers over the segments of a digit.
+
+    Args:
+        font: Segments of each digit.
+
+    Returns:
+        Dictionary from signatures to digits.
+
+    """
+    masks = [encode_pattern(x) for x in font]
+    segment_counts = count_segments(masks)
+    table = {calculate_signature(mask, segment_counts): digit for digit, mask in enumerate(masks)}
+    if len(table) != len(font):
+        raise ValueError("The signatures of the digits of the font are not unique")
+
+    return table
+
+
+SIGNATURE_TABLE = build_signature_table(SEVEN_SEGMENT_FONT)
+
+
+def decode_number(signals: list[str], digits: list[str]) -> int:
+    """Decodes the number of the output digits of a display, given the patterns of all its digits.
+
+    Args:
+        signals: Patterns of the ten digits.
+        digits: Patterns of the output digits.
+
+    Returns:
+        Output number.
+
+    """
+    segment_counts = count_segments([encode_pattern(x) for x in signals])
+
+    number = 0
+    for digit in digits:
+        number = number * 10 + SIGNATURE_TABLE[calculate_signature(encode_pattern(digit), segment_counts)]
+
+    return number
+
+
+def add_all_numbers_bitmask(signals, digits):
+    return sum(decode_number(sig, dig) for sig, dig in zip(signals, digits))
+
+
+# Cached streaming decoder
+
+class WiringDecoder:
+
+    def __init__(self, maxsize: int = 1024):
+        """Decoder of display lines that remembers the wirings it has already solved.
+
+        The same wiring always produces the same ten patterns, so their sorted masks are used as the key of a cache
+        of the solved wirings, that keeps only the `maxsize` most recently used.
+
+        Args:
+            maxsize: Maximum number of wirings in the cache.
+
+        """
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"WiringDecoder(maxsize={self.maxsize}, hits={self.hits}, misses={self.misses})"
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of the lines whose wiring was already in the cache."""
+        n_lookups = self.hits + self.misses
+
+        return self.hits / n_lookups if n_lookups else 0.0
+
+    def solve_wiring(self, signals: list[str]) -> dict[int, int]:
+        """Gets the digit of each pattern mask of a wiring, from the cache if possible.
+
+        Args:
+            signals: Patterns of the ten digits.
+
+        Returns:
+            Dictionary from pattern masks to digits.
+
+        """
+        masks = [encode_pattern(x) for x in signals]
+        key = tuple(sorted(masks))
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        segment_counts = count_segments(masks)
+        wiring = {mask: SIGNATURE_TABLE[calculate_signature(mask, segment_counts)] for mask in masks}
+
+        self.cache[key] = wiring
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+        return wiring
+
+    def decode_line(self, line: str) -> int:
+        """Decodes the output number of a line of the input."""
+        signals_line, digits_line = line.split('|')
+        wiring = self.solve_wiring(signals_line.split())
+
+        number = 0
+        for digit in digits_line.split():
+            number = number * 10 + wiring[encode_pattern(digit)]
+
+        return number
+
+    def decode_lines(self, lines: Iterable[str]) -> int:
+        """Adds the output numbers of several lines of the input, skipping empty lines."""
+        return sum(self.decode_line(line) for line in lines if line.strip())
+
+
+def iter_line_chunks(path: str, chunk_size: int) -> Iterator[list[str]]:
+    """Reads a file in chunks of lines."""
+    with open(path, 'r') as f:
+        while chunk := list(islice(f, chunk_size)):
+            yield chunk
+
+
+_worker_decoder = None
+
+
+def _init_worker_decoder(maxsize: int):
+    """Creates the decoder of a worker process, so its cache is kept between chunks."""
+    global _worker_decoder
+    _worker_decoder = WiringDecoder(maxsize)
+
+
+def _decode_chunk(lines: list[str]) -> tuple[int, int, int]:
+    """Adds the output numbers of a chunk of lines in a worker process."""
+    hits, misses = _worker_decoder.hits, _worker_decoder.misses
+    total = _worker_decoder.decode_lines(lines)
+
+    return total, _worker_decoder.hits - hits, _worker_decoder.misses - misses
+
+
+def add_all_numbers_parallel(path: str, maxsize: int = 1024, chunk_size: int = 10_000,
+                             n_workers: int | None = None) -> tuple[int, float]:
+    """Adds the output numbers of all the lines of a file, decoding chunks of lines in a pool of processes.
+
+    Only a few chunks per process are read ahead, so the file is never fully in memory.
+
+    Args:
+        path: Path to the input file.
+        maxsize: Maximum number of wirings in the cache of each process.
+        chunk_size: Number of lines per chunk.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Sum of the output numbers and hit rate of the caches.
+
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    total = hits = misses = 0
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker_decoder,
+                             initargs=(maxsize,)) as executor:
+        pending = []
+        for chunk in iter_line_chunks(path, chunk_size):
+            pending.append(executor.submit(_decode_chunk, chunk))
+            if len(pending) >= 2 * n_workers:
+                chunk_total, chunk_hits, chunk_misses = pending.pop(0).result()
+                total, hits, misses = total + chunk_total, hits + chunk_hits, misses + chunk_misses
+
+        for future in pending:
+            chunk_total, chunk_hits, chunk_misses = future.result()
+            total, hits, misses = total + chunk_total, hits + chunk_hits, misses + chunk_misses
+
+    return total, hits / (hits + misses) if hits + misses else 0.0
+
+
+# Generalized font solver
+
+class CompiledFont:
+
+    def __init__(self, font: list[str]):
+        """Lookup tables of a segment display font, built once and shared by all the displays that use it.
+
+        Segments are named by characters and numbered in alphabetical order, so every pattern is a bitmask.
+
+        Args:
+            font: Segments of each digit, where the position in the list is the digit.
+
+        """
+        self.segment_names = sorted(set("".join(font)))
+        self.segment_idxs = {name: i for i, name in enumerate(self.segment_names)}
+        self.n_segments = len(self.segment_names)
+        self.all_segments = (1 << self.n_segments) - 1
+
+        self.masks = [self.encode(x) for x in font]
+        self.digit_by_mask = {mask: digit for digit, mask in enumerate(self.masks)}
+        if len(self.digit_by_mask) != len(font):
+            raise ValueError("The digits of the font are not unique")
+
+        self.masks_by_size = {}
+        for mask in self.masks:
+            self.masks_by_size.setdefault(mask.bit_count(), []).append(mask)
+
+        # The sizes of the digits that use a segment don't change when the wires are scrambled
+        self.segments_by_signature = {}
+        for segment in range(self.n_segments):
+            signature = self.signature(segment, self.masks)
+            self.segments_by_signature[signature] = self.segments_by_signature.get(signature, 0) | (1 << segment)
+
+    def __repr__(self):
+        return f"CompiledFont(n_digits={len(self.masks)}, n_segments={self.n_segments})"
+
+    def encode(self, pattern: str) -> int:
+        """Encodes a pattern of segments or wires as a bitmask."""
+        mask = 0
+        for name in pattern:
+            mask |= 1 << self.segment_idxs[name]
+
+        return mask
+
+    @staticmethod
+    def signature(segment: int, masks: list[int]) -> tuple[int, ...]:
+        """Gets the sorted sizes of the patterns that use a segment or wire."""
+        return tuple(sorted(mask.bit_count() for mask in masks if mask >> segment & 1))
+
+
+def _propagate(candidates: list[int], patterns: list[int], font: CompiledFont) -> bool:
+    """Narrows down the segments each wire can be connected to until nothing changes.
+
+    Args:
+        candidates: Bitmask of the possible segments of each wire. Modified in place.
+        patterns: Bitmasks of the wires of the ten patterns.
+        font: Compiled font.
+
+    Returns:
+        False if some wire has no possible segment left.
+
+    """
+    changed = True
+    while changed:
+        changed = False
+        old = list(candidates)
+
+        # Every pattern is one of the digits of its size that are still consistent with the candidates
+        for pattern in patterns:
+            on_mask = off_mask = 0
+            for digit_mask in font.masks_by_size.get(pattern.bit_count(), []):
+                if all(candidates[w] & (digit_mask if pattern >> w & 1 else ~digit_mask)
+                       for w in range(font.n_segments)):
+                    on_mask |= digit_mask
+                    off_mask |= ~digit_mask & font.all_segments
+            for w in range(font.n_segments):
+                candidates[w] &= on_mask if pattern >> w & 1 else off_mask
+
+        # A wire with a single segment left takes it from the rest of the wires
+        for w, candidate in enumerate(candidates):
+            if candidate.bit_count() == 1:
+                for other in range(font.n_segments):
+                    if other != w:
+                        candidates[other] &= ~candidate
+
+        # A segment possible for a single wire is connected to that wire
+        for segment in range(font.n_segments):
+            wires = [w for w in range(font.n_segments) if candidates[w] >> segment & 1]
+            if len(wires) == 1:
+                candidates[wires[0]] = 1 << segment
+
+        if not all(candidates):
+            return False
+        changed = candidates != old
+
+    return True
+
+
+def _search_wiring(candidates: list[int], patterns: list[int], font: CompiledFont) -> list[int] | None:
+    """Finds a wiring by propagation, backtracking on the wire with fewest candidates when propagation gets stuck."""
+    if not _propagate(candidates, patterns, font):
+        return None
+
+    undecided = [w for w in range(font.n_segments) if candidates[w].bit_count() > 1]
+    if not undecided:
+        # Check that every pattern is a digit of the font
+        wiring = [candidate.bit_length() - 1 for candidate in candidates]
+        for pattern in patterns:
+            if apply_wiring(pattern, wiring) not in font.digit_by_mask:
+                return None
+
+        return wiring
+
+    wire = min(undecided, key=lambda w: candidates[w].bit_count())
+    options = candidates[wire]
+    while options:
+        segment = options & -options
+        options ^= segment
+        attempt = list(candidates)
+        attempt[wire] = segment
+        wiring = _search_wiring(attempt, patterns, font)
+        if wiring is not None:
+            return wiring
+
+    return None
+
+
+def apply_wiring(pattern: int, wiring: list[int]) -> int:
+    """Converts a bitmask of wires to a bitmask of segments."""
+    mask = 0
+    for wire, segment in enumerate(wiring):
+        if pattern >> wire & 1:
+            mask |= 1 << segment
+
+    return mask
+
+
+def solve_wiring(signals: list[str], font: CompiledFont) -> list[int]:
+    """Finds the segment each wire is connected to, given the patterns of all the digits of a font.
+
+    Args:
+        signals: Patterns of all the digits, as the wires that are on.
+        font: Compiled font.
+
+    Returns:
+        Segment of each wire.
+
+    """
+    patterns = [font.encode(x) for x in signals]
+
+    # Start from the segments with the same signature as each wire
+    candidates = [font.segments_by_signature.get(font.signature(w, patterns), 0) for w in range(font.n_segments)]
+    wiring = _search_wiring(candidates, patterns, font)
+    if wiring is None:
+        raise ValueError(f"The patterns {signals} don't match the font")
+
+    return wiring
+
+
+def decode_digits(signals: list[str], digits: list[str], font: CompiledFont) -> list[int]:
+    """Decodes the output digits of a display with any font.
+
+    Args:
+        signals: Patterns of all the digits.
+        digits: Patterns of the output digits.
+        font: Compiled font.
+
+    Returns:
+        Output digits.
+
+    """
+    wiring = solve_wiring(signals, font)
+
+    return [font.digit_by_mask[apply_wiring(font.encode(x), wiring)] for x in digits]
+
+
+if __name__ == "__main__":
+    signals, digits = read_input()
+
+    # Part 1
+    n_easy_digits = count_easy_digits(digits)
+
+    print(f"The number of easy digits is equal to {n_easy_digits}")
+
+    # Part 2
+    total_amount = add_all_numbers(signals, digits)
+
+    print(f"The total amount is equal to {total_amount}")
+
+    # Bitmask decoder
+    total_amount = add_all_numbers_bitmask(signals, digits)
+
+    print(f"The total amount (bitmask) is equal to {total_amount}")
+
+    # Cached streaming decoder
+    wiring_decoder = WiringDecoder()
+    with open("Day 8 - Seven Segment Search/input.txt", 'r') as f:
+        total_amount = wiring_decoder.decode_lines(f)
+
+    print(f"The total amount (cached) is equal to {total_amount}, "
+          f"with a cache hit rate of {wiring_decoder.hit_rate:.2%}")
+
+    # Generalized font solver
+    seven_segment_font = CompiledFont(SEVEN_SEGMENT_FONT)
+    total_amount = sum(int("".join(str(x) for x in decode_digits(sig, dig, seven_segment_font)))
+                       for sig, dig in zip(signals, digits))
+
+    print(f"The total amount (font solver) is equal to {total_amount}")
+
+    # Parallel
+    total_amount, hit_rate = add_all_numbers_parallel("Day 8 - Seven Segment Search/input.txt", chunk_size=50)
 
-print(f"The total amount is equal to {total_amount}")
+    print(f"The total amount (parallel) is equal to {total_amount}, with a cache hit rate of {hit_rate:.2%}")
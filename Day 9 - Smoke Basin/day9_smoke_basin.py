@@ -1,5 +1,10 @@
+import heapq
+import os
+import tempfile
 import numpy as np
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
 
 
 def read_input() -> np.ndarray:
@@ -51,6 +56,45 @@ def sum_low_points(lows: list[int]) -> int:
     return sum([x + 1 for x in lows])
 
 
+def _shifted_slices(offset: int) -> tuple[slice, slice]:
+    """Gets the slices of the elements and of their neighbors at `offset` along one axis."""
+    if offset > 0:
+        return slice(0, -offset), slice(offset, None)
+    if offset < 0:
+        return slice(-offset, None), slice(0, offset)
+
+    return slice(None), slice(None)
+
+
+def find_low_points_vectorized(arr: np.ndarray, diagonal: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """Given an array finds the indices and values of the elements surrounded by larger values, comparing the whole
+    array with its shifted views at once.
+
+    Neighbors out of the array are ignored, as if they were larger.
+
+    Args:
+        arr: 2D array.
+        diagonal: If True, the 4 diagonal neighbors are also compared.
+
+    Returns:
+        Array of shape (N, 2) with the indices of the low points and array with their values.
+
+    """
+    neighs = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+    if diagonal:
+        neighs += [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+    is_low = np.ones(arr.shape, dtype=bool)
+    for di, dj in neighs:
+        rows, neigh_rows = _shifted_slices(di)
+        cols, neigh_cols = _shifted_slices(dj)
+        is_low[rows, cols] &= arr[rows, cols] < arr[neigh_rows, neigh_cols]
+
+    low_idxs = np.argwhere(is_low)
+
+    return low_idxs, arr[is_low]
+
+
 ##################################################################################################
 
 def is_valid(vis: np.ndarray, idxs: tuple) -> bool:
@@ -128,18 +172,392 @@ def find_largest_basins(arr: np.ndarray, low_idxs: tuple[int, int], n_largest: i
     return np.prod(largest_basins_lengths)
 
 
-heightmap = read_input()
+def find_unique_rows(arr: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the distinct rows of a 2D array, sorting them instead of using the slower np.unique(axis=0).
+
+    Args:
+        arr: 2D array.
+
+    Returns:
+        Distinct rows in lexicographic order, and index of the distinct row of each row of the array.
+
+    """
+    order = np.lexsort(arr.T[::-1])
+    sorted_rows = arr[order]
+    is_first = np.concatenate([[True], (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)])
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(is_first) - 1
+
+    return sorted_rows[is_first], inverse
+
+
+def expand_groups(ids: np.ndarray, n_basins: int, group_offsets: np.ndarray,
+                  group_members: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Expands ids of single basins or of groups of basins into the basins they contain.
+
+    Args:
+        ids: Array of ids, from 1 to `n_basins` for single basins and larger for groups.
+        n_basins: Number of single basins.
+        group_offsets: Start of the basins of each group in `group_members`, and the end of the last one.
+        group_members: Basins of all the groups one after the other.
+
+    Returns:
+        Basins of all the ids one after the other, and number of basins of each id.
+
+    """
+    is_group = ids > n_basins
+    lengths = np.ones(len(ids), dtype=np.int64)
+    lengths[is_group] = np.diff(group_offsets)[ids[is_group] - n_basins - 1]
+    starts = np.zeros(len(ids), dtype=np.int64)
+    starts[is_group] = group_offsets[ids[is_group] - n_basins - 1]
+
+    # Position of each basin among the basins of its id
+    ranks = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    basins = np.repeat(ids, lengths)
+    from_group = np.repeat(is_group, lengths)
+    basins[from_group] = group_members[(np.repeat(starts, lengths) + ranks)[from_group]]
+
+    return basins, lengths
+
+
+def merge_basins(combinations: np.ndarray, n_basins: int, group_offsets: np.ndarray,
+                 group_members: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the sorted union of the basins of each combination of ids.
+
+    Args:
+        combinations: 2D array with a combination of ids in each row, padded with 0.
+        n_basins: Number of single basins.
+        group_offsets: Start of the basins of each group in `group_members`, and the end of the last one.
+        group_members: Basins of all the groups one after the other.
+
+    Returns:
+        Basins of all the unions one after the other, and number of basins of each union.
+
+    """
+    combination_idxs, col_idxs = np.nonzero(combinations)
+    basins, lengths = expand_groups(combinations[combination_idxs, col_idxs], n_basins, group_offsets, group_members)
+
+    # Encode the combination and the basin in one integer to sort and deduplicate both at once
+    keys = np.unique(np.repeat(combination_idxs, lengths).astype(np.int64) * (n_basins + 1) + basins)
+
+    return (keys % (n_basins + 1)).astype(np.int32), np.bincount(keys // (n_basins + 1), minlength=len(combinations))
+
+
+def label_basins(arr: np.ndarray, wall: int = 9) -> tuple[np.ndarray, np.ndarray]:
+    """Labels all the basins of an array at once, with the same basins as `bfs_basin` from every low point.
+
+    A cell belongs to the basin of a low point if there is a path of strictly decreasing values below `wall` from the
+    cell to the low point. Cells are labeled level by level in increasing order of value, so all the lower neighbors of
+    a cell are already labeled and it takes the union of their basins. Each distinct group of several basins gets its
+    own id the first time it appears, so cells in several basins are handled all at once, like the rest.
+
+    Args:
+        arr: 2D array.
+        wall: Value that separates basins.
+
+    Returns:
+        Array with the label of the basin of each cell, 0 outside any basin and -1 for cells in several basins, and
+        array with the size of each basin. Basins are numbered from 1 in the order of `find_low_points_vectorized`.
+        Cells in several basins are counted in each of them, like when running `bfs_basin` from each low point.
+
+    """
+    neighs = ((-1, 0), (0, -1), (1, 0), (0, 1))
+    low_idxs, _ = find_low_points_vectorized(arr)
+    n_basins = len(low_idxs)
+
+    # Ids 1 to n_basins are single basins and larger ids are groups of several basins, whose basins are stored in
+    # `group_members` from `group_offsets[i]` to `group_offsets[i + 1]` for the group with id n_basins + i + 1
+    ids = np.zeros(arr.shape, dtype=np.int32)
+    ids[tuple(low_idxs.T)] = np.arange(1, n_basins + 1)
+    group_offsets = np.zeros(1, dtype=np.int64)
+    group_members = np.empty(0, dtype=np.int32)
+
+    for level in np.unique(arr[arr < wall]):
+        rows, cols = np.nonzero((arr == level) & (ids == 0))
+
+        # Ids of the lower neighbors, 0 when there is no lower neighbor in that direction
+        neigh_ids = np.zeros((len(rows), len(neighs)), dtype=np.int32)
+        for k, (di, dj) in enumerate(neighs):
+            n_rows, n_cols = rows + di, cols + dj
+            inside = (n_rows >= 0) & (n_rows < arr.shape[0]) & (n_cols >= 0) & (n_cols < arr.shape[1])
+            lower = np.zeros(len(rows), dtype=bool)
+            lower[inside] = arr[n_rows[inside], n_cols[inside]] < level
+            neigh_ids[lower, k] = ids[n_rows[lower], n_cols[lower]]
+
+        max_id = neigh_ids.max(axis=1, initial=0)
+        min_id = np.where(neigh_ids > 0, neigh_ids, max_id[:, None]).min(axis=1)
+        cell_ids = max_id
+
+        # Cells with lower neighbors in different basins take a new group with the union of their basins, which is
+        # calculated once for each distinct combination of lower neighbors
+        merging = min_id != max_id
+        if merging.any():
+            combinations, inverse = find_unique_rows(np.sort(neigh_ids[merging], axis=1))
+            members, n_members = merge_basins(combinations, n_basins, group_offsets, group_members)
+
+            n_groups = len(group_offsets) - 1
+            cell_ids[merging] = n_basins + n_groups + 1 + inverse
+            group_members = np.concatenate([group_members, members])
+            group_offsets = np.concatenate([group_offsets, group_offsets[-1] + np.cumsum(n_members)])
+
+        ids[rows, cols] = cell_ids
+
+    # Every cell of a group adds one to each of the basins of the group
+    counts = np.bincount(ids.ravel(), minlength=n_basins + len(group_offsets))
+    group_counts = np.repeat(counts[n_basins + 1:], np.diff(group_offsets))
+    sizes = counts[1:n_basins + 1] + np.bincount(group_members - 1, weights=group_counts,
+                                                 minlength=n_basins).astype(np.int64)
 
-# Part 1
+    return np.where(ids > n_basins, -1, ids), sizes
 
-low_idxs = find_low_points_idxs(heightmap)
-low_points = find_low_points_values(heightmap, low_idxs)
-lows_sum = sum_low_points(low_points)
 
-print(f"The sum of low points is equal to {lows_sum}")
+def find_largest_basins_labeled(arr: np.ndarray, n_largest: int) -> int:
+    """Finds the largest basins of an array by labeling all of them at once and returns the product of their sizes."""
+    _, sizes = label_basins(arr)
 
+    return int(np.prod(heapq.nlargest(n_largest, sizes.tolist())))
 
-# Part 2
-n_largest = 3
-sum_largest_basins = find_largest_basins(heightmap, low_idxs, n_largest=n_largest)
-print(f"The sum of the {n_largest} basins is equal to {sum_largest_basins}")
+
+def convert_input_to_raw(text_path: str, raw_path: str) -> tuple[int, int]:
+    """Converts an input file to a raw uint8 heightmap, one row at a time.
+
+    Args:
+        text_path: Path to the input file.
+        raw_path: Path to the raw heightmap.
+
+    Returns:
+        Shape of the heightmap.
+
+    """
+    n_rows = n_cols = 0
+    with open(text_path, 'r') as f_in, open(raw_path, 'wb') as f_out:
+        for line in f_in:
+            row = line.strip()
+            if not row:
+                continue
+            if n_cols and len(row) != n_cols:
+                raise ValueError(f"Row {n_rows} has {len(row)} values instead of {n_cols}")
+
+            n_cols = len(row)
+            f_out.write((np.frombuffer(row.encode(), dtype=np.uint8) - ord('0')).tobytes())
+            n_rows += 1
+
+    return n_rows, n_cols
+
+
+def open_heightmap_raw(path: str, n_cols: int) -> np.memmap:
+    """Memory-maps a raw uint8 heightmap with `n_cols` columns."""
+    return np.memmap(path, dtype=np.uint8, mode='r', shape=(os.path.getsize(path) // n_cols, n_cols))
+
+
+def split_tiles(shape: tuple[int, int], tile_shape: tuple[int, int]) -> list[tuple[int, int, int, int]]:
+    """Splits an array in tiles, given as (first row, last row + 1, first column, last column + 1)."""
+    return [(r, min(r + tile_shape[0], shape[0]), c, min(c + tile_shape[1], shape[1]))
+            for r, c in product(range(0, shape[0], tile_shape[0]), range(0, shape[1], tile_shape[1]))]
+
+
+def find_tile_low_points(path: str, n_cols: int, tile: tuple[int, int, int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the low points of a tile of a raw heightmap.
+
+    The tile is read with a halo of one cell, so the cells on its borders are compared with the neighbor tiles.
+
+    Args:
+        path: Path to the raw heightmap.
+        n_cols: Number of columns of the heightmap.
+        tile: First row, last row + 1, first column and last column + 1 of the tile.
+
+    Returns:
+        Array of shape (N, 2) with the indices of the low points in the heightmap and array with their values.
+
+    """
+    heightmap = open_heightmap_raw(path, n_cols)
+    r0, r1, c0, c1 = tile
+    h_r0, h_c0 = max(r0 - 1, 0), max(c0 - 1, 0)
+    haloed = np.array(heightmap[h_r0:min(r1 + 1, heightmap.shape[0]), h_c0:min(c1 + 1, heightmap.shape[1])])
+
+    low_idxs, low_values = find_low_points_vectorized(haloed)
+    low_idxs += (h_r0, h_c0)
+
+    # Low points of the halo belong to the neighbor tiles
+    inside = (low_idxs[:, 0] >= r0) & (low_idxs[:, 0] < r1) & (low_idxs[:, 1] >= c0) & (low_idxs[:, 1] < c1)
+
+    return low_idxs[inside], low_values[inside]
+
+
+def find_low_points_tiled(path: str, n_cols: int, tile_shape: tuple[int, int] = (1024, 1024),
+                          n_workers: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Finds the low points of a raw heightmap, processing its tiles in a pool of processes.
+
+    Args:
+        path: Path to the raw heightmap.
+        n_cols: Number of columns of the heightmap.
+        tile_shape: Shape of the tiles.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Array of shape (N, 2) with the indices of the low points and array with their values.
+
+    """
+    tiles = split_tiles(open_heightmap_raw(path, n_cols).shape, tile_shape)
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+        results = list(executor.map(find_tile_low_points, [path] * len(tiles), [n_cols] * len(tiles), tiles))
+
+    return (np.concatenate([idxs for idxs, _ in results]).reshape(-1, 2),
+            np.concatenate([values for _, values in results]))
+
+
+def union_find(parent: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Joins the sets of each pair of elements (a[i], b[i]), all the pairs at once.
+
+    Every set is represented by its smallest element, so the roots only decrease and the loop ends when all the pairs
+    share a root.
+
+    Args:
+        parent: Parent of each element. Elements that are their own parent are roots.
+        a: First elements of the pairs.
+        b: Second elements of the pairs.
+
+    Returns:
+        Root of each element.
+
+    """
+    parent = parent.copy()
+    while True:
+        # Point every element to its root
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+
+        root_a, root_b = parent[a], parent[b]
+        different = root_a != root_b
+        if not different.any():
+            return parent
+
+        np.minimum.at(parent, np.maximum(root_a, root_b)[different], np.minimum(root_a, root_b)[different])
+
+
+def label_tile_basins(path: str, n_cols: int, tile: tuple[int, int, int, int], wall: int = 9) -> dict:
+    """Labels the basins of a tile of a raw heightmap as the regions of cells below `wall`.
+
+    Labels are the flat index in the heightmap of the first cell of each region, so they are unique across tiles.
+
+    Args:
+        path: Path to the raw heightmap.
+        n_cols: Number of columns of the heightmap.
+        tile: First row, last row + 1, first column and last column + 1 of the tile.
+        wall: Value that separates basins.
+
+    Returns:
+        Dictionary with the labels and sizes of the basins of the tile and the labels of the cells in its four
+        borders, -1 for walls.
+
+    """
+    r0, r1, c0, c1 = tile
+    arr = np.array(open_heightmap_raw(path, n_cols)[r0:r1, c0:c1])
+    cells = np.arange(arr.size).reshape(arr.shape)
+    open_cells = arr < wall
+
+    # Pairs of adjacent open cells
+    right = open_cells[:, :-1] & open_cells[:, 1:]
+    down = open_cells[:-1, :] & open_cells[1:, :]
+    a = np.concatenate([cells[:, :-1][right], cells[:-1, :][down]])
+    b = np.concatenate([cells[:, 1:][right], cells[1:, :][down]])
+    roots = union_find(np.arange(arr.size), a, b).reshape(arr.shape)
+
+    # Convert roots to flat indices in the heightmap
+    global_roots = np.where(open_cells, (r0 + roots // arr.shape[1]) * n_cols + c0 + roots % arr.shape[1], -1)
+    labels, sizes = np.unique(global_roots[open_cells], return_counts=True)
+
+    return {
+        'labels': labels,
+        'sizes': sizes,
+        'top': global_roots[0, :],
+        'bottom': global_roots[-1, :],
+        'left': global_roots[:, 0],
+        'right': global_roots[:, -1],
+    }
+
+
+def find_basin_sizes_tiled(path: str, n_cols: int, tile_shape: tuple[int, int] = (1024, 1024), wall: int = 9,
+                           n_workers: int | None = None) -> np.ndarray:
+    """Finds the sizes of the basins of a raw heightmap, labeling its tiles in a pool of processes.
+
+    The basins of each tile are joined with the ones of the neighbor tiles through the pairs of cells on both sides of
+    their borders. Basins are the regions of cells below `wall`, which are the same basins as the ones of
+    `label_basins` when each region has a single low point, as in the puzzle input.
+
+    Args:
+        path: Path to the raw heightmap.
+        n_cols: Number of columns of the heightmap.
+        tile_shape: Shape of the tiles.
+        wall: Value that separates basins.
+        n_workers: Number of processes. Defaults to the number of CPUs.
+
+    Returns:
+        Array with the size of each basin.
+
+    """
+    tiles = split_tiles(open_heightmap_raw(path, n_cols).shape, tile_shape)
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count()) as executor:
+        results = dict(zip([tile[::2] for tile in tiles],
+                           executor.map(label_tile_basins, [path] * len(tiles), [n_cols] * len(tiles), tiles,
+                                        [wall] * len(tiles))))
+
+    # Pairs of labels on both sides of the borders between tiles
+    pairs = []
+    for (r0, c0), result in results.items():
+        if (r0 + tile_shape[0], c0) in results:
+            pairs.append((result['bottom'], results[(r0 + tile_shape[0], c0)]['top']))
+        if (r0, c0 + tile_shape[1]) in results:
+            pairs.append((result['right'], results[(r0, c0 + tile_shape[1])]['left']))
+
+    labels = np.concatenate([result['labels'] for result in results.values()])
+    sizes = np.concatenate([result['sizes'] for result in results.values()])
+    a = np.concatenate([x for x, _ in pairs] + [np.empty(0, dtype=labels.dtype)])
+    b = np.concatenate([y for _, y in pairs] + [np.empty(0, dtype=labels.dtype)])
+    joined = (a >= 0) & (b >= 0)
+
+    # Labels are sorted within each tile but not across tiles
+    order = np.argsort(labels)
+    labels, sizes = labels[order], sizes[order]
+    roots = union_find(np.arange(len(labels)), np.searchsorted(labels, a[joined]), np.searchsorted(labels, b[joined]))
+
+    return np.bincount(roots, weights=sizes, minlength=len(labels))[np.unique(roots)].astype(np.int64)
+
+
+if __name__ == "__main__":
+    heightmap = read_input()
+
+    # Part 1
+    low_idxs = find_low_points_idxs(heightmap)
+    low_points = find_low_points_values(heightmap, low_idxs)
+    lows_sum = sum_low_points(low_points)
+
+    print(f"The sum of low points is equal to {lows_sum}")
+
+    # Part 2
+    n_largest = 3
+    sum_largest_basins = find_largest_basins(heightmap, low_idxs, n_largest=n_largest)
+    print(f"The sum of the {n_largest} basins is equal to {sum_largest_basins}")
+
+    # Vectorized
+    low_idxs_vectorized, low_points_vectorized = find_low_points_vectorized(heightmap)
+    print(f"The sum of low points (vectorized) is equal to {sum_low_points(low_points_vectorized.tolist())}")
+
+    sum_largest_basins = find_largest_basins_labeled(heightmap, n_largest=n_largest)
+    print(f"The sum of the {n_largest} basins (labeled) is equal to {sum_largest_basins}")
+
+    # Tiled
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        raw_path = os.path.join(tmp_dir, "heightmap.raw")
+        _, n_cols = convert_input_to_raw("Day 9 - Smoke Basin/input.txt", raw_path)
+
+        _, low_points_tiled = find_low_points_tiled(raw_path, n_cols, tile_shape=(32, 32))
+        basin_sizes_tiled = find_basin_sizes_tiled(raw_path, n_cols, tile_shape=(32, 32))
+
+    print(f"The sum of low points (tiled) is equal to {sum_low_points(low_points_tiled.tolist())}")
+    print(f"The sum of the {n_largest} basins (tiled) is equal to "
+          f"{np.prod(heapq.nlargest(n_largest, basin_sizes_tiled.tolist()))}")